@@ -1,19 +1,19 @@
 import streamlit as st
 import pandas as pd
-import os
 import plotly.express as px
-from datetime import datetime
-from fpdf import FPDF
-from fpdf.enums import XPos, YPos
-import tempfile
-from supabase import create_client, Client
-import requests
+import math
+import qa_metricas
+from qa_dados import (STATUS_OPCOES, PRIORIDADE_OPCOES, STATUS_BUGS, COLS_CRITERIOS, COLS_TESTES, BUSCA_CRITERIOS,
+                      BUSCA_TESTES, IMPORT_COLUNAS, IMPORT_OBRIGATORIAS, conectar, estatisticas_pool, autenticar,
+                      listar_execucoes, criar_execucao, criar_em_lote, salvar_diff, IdEmUso, salvar_bugs,
+                      carregar_pagina, listar_ids_testes, resumo_criterios, resumo_testes, resumo_bugs, carregar_bugs,
+                      registrar_bug, anexar_evidencias, ids_no_nome, importar_arquivo, ArquivoInvalido,
+                      montar_snapshot, carregar_tendencias)
+from qa_relatorio import CORES_GRAF, FilaCheia, FilaRelatorios
 
 # --- CONFIGURAÇÃO SUPABASE ---
 try:
-    SUPABASE_URL = st.secrets["SUPABASE_URL"]
-    SUPABASE_KEY = st.secrets["SUPABASE_KEY"]
-    supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+    conectar(st.secrets["SUPABASE_URL"], st.secrets["SUPABASE_KEY"])
 except Exception:
     st.error("Configure as chaves SUPABASE_URL e SUPABASE_KEY nos Secrets do Streamlit.")
     st.stop()
@@ -21,189 +21,55 @@ except Exception:
 # --- CONFIGURAÇÃO VISUAL ---
 st.set_page_config(page_title="QA Governance ", layout="wide")
 
-STATUS_OPCOES = ["Pendente", "Em Execucao", "OK", "Falha", "Bloqueado", "N/A"]
-PRIORIDADE_OPCOES = ["Baixa", "Media", "Alta", "Critica"]
+TAMANHOS_PAGINA = [25, 50, 100, 250]
 
-CORES_GRAF = {
-    "OK": "#4b4c6a",        
-    "Falha": "#780096",       
-    "Pendente": "#c2c7cd",
-    "Bloqueado": "#5f365e",
-    "Em Execucao": "#848dae"
-}
+medicoes = qa_metricas.iniciar("rerun")
 
 # --- FUNÇÕES DE APOIO ---
-def get_next_auto_id(prefix, table, col, exec_id):
-    res = supabase.table(table).select(col).eq("exec_id", exec_id).order("id", desc=True).limit(1).execute()
-    if not res.data: return f"{prefix}-001"
-    try:
-        num = int(res.data[0][col].split('-')[1])
-        return f"{prefix}-{str(num + 1).zfill(3)}"
-    except: return f"{prefix}-001"
-
-# --- PDF REPORT ENGINE ---
-class QAReport(FPDF):
-    def header(self):
-        self.set_font('helvetica', 'B', 10)
-        self.set_text_color(100, 100, 100)
-        self.cell(0, 10, 'SISTEMA DE GOVERNANCA DE QA - RELATORIO DE EXECUÇÃO', new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='L')
-        self.line(15, 18, 195, 18)
-        self.ln(5)
-
-    def section_header(self, title):
-        self.ln(5)
-        self.set_font('helvetica', 'B', 12)
-        self.set_fill_color(245, 247, 249)
-        self.set_text_color(44, 62, 80)
-        self.cell(0, 10, f" {title.upper()}", fill=True, new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='L')
-        self.ln(3)
-
-def gerar_pdf_completo(ciclo_nome, df_testes, df_crits, exec_id, img_pie_path, img_bar_path):
-    pdf = QAReport()
-    pdf.set_margins(15, 15, 15)
-    pdf.set_auto_page_break(auto=True, margin=20)
-    
-    # --- PÁGINA 1: CAPA ---
-    pdf.add_page()
-    pdf.set_y(80)
-    pdf.set_font('helvetica', 'B', 28)
-    pdf.set_text_color(44, 62, 80)
-    pdf.cell(0, 20, "RELATÓRIO DE EXECUÇÃO DE QA", new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='C')
-    
-    pdf.set_font('helvetica', 'B', 16)
-    pdf.set_text_color(100, 100, 100)
-    pdf.cell(0, 10, f"PROJETO: {ciclo_nome.upper()}", new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='C')
-    
-    pdf.set_y(250)
-    pdf.set_font('helvetica', 'I', 10)
-    pdf.cell(0, 10, f"Gerado em: {datetime.now().strftime('%d/%m/%Y %H:%M')}", align='C')
-
-    # --- PÁGINA 2: DASHBOARD & RESUMO ---
-    pdf.add_page()
-    pdf.section_header("SUMÁRIO EXECUTIVO")
-    
-    # Tabela de Resumo de Status
-    status_counts = df_testes['Status'].value_counts()
-    pdf.set_font('helvetica', 'B', 10)
-    pdf.set_fill_color(230, 230, 230)
-    pdf.cell(90, 8, "Status", border=1, fill=True)
-    pdf.cell(90, 8, "Quantidade", border=1, fill=True, new_x=XPos.LMARGIN, new_y=YPos.NEXT)
-    
-    pdf.set_font('helvetica', '', 10)
-    for status, count in status_counts.items():
-        pdf.cell(90, 8, f" {status}", border=1)
-        pdf.cell(90, 8, f" {count}", border=1, new_x=XPos.LMARGIN, new_y=YPos.NEXT)
-
-    # Gráficos
-    if img_pie_path and img_bar_path:
-        pdf.ln(10)
-        pdf.image(img_pie_path, x=55, w=100)
-        pdf.ln(5)
-        pdf.image(img_bar_path, x=20, w=170)
-
-    # --- PÁGINA 3: CRITÉRIOS DE ACEITE ---
-    if not df_crits.empty:
-        pdf.add_page()
-        pdf.section_header("CRITÉRIOS DE ACEITE")
-        pdf.set_font('helvetica', 'B', 9)
-        pdf.set_fill_color(200, 205, 210)
-        pdf.cell(25, 8, "ID", border=1, fill=True)
-        pdf.cell(100, 8, "Descrição", border=1, fill=True)
-        pdf.cell(30, 8, "Prioridade", border=1, fill=True)
-        pdf.cell(25, 8, "Status", border=1, fill=True, new_x=XPos.LMARGIN, new_y=YPos.NEXT)
-        
-        pdf.set_font('helvetica', '', 8)
-        for _, c in df_crits.iterrows():
-            pdf.cell(25, 7, f" {c['ID']}", border=1)
-            pdf.cell(100, 7, f" {str(c['Descricao'])[:60]}...", border=1)
-            pdf.cell(30, 7, f" {c['Prioridade']}", border=1)
-            pdf.cell(25, 7, f" {c['Status']}", border=1, new_x=XPos.LMARGIN, new_y=YPos.NEXT)
-
-    # --- DETALHAMENTO DOS TESTES ---
-    pdf.add_page()
-    pdf.section_header("DETALHAMENTO DA EXECUÇÃO")
-
-    largura_util = pdf.w - pdf.l_margin - pdf.r_margin
-    
-    evs_data = supabase.table("evidencias").select("caminho, test_id").eq("exec_id", exec_id).execute().data
-    
-    for _, r in df_testes.iterrows():
-        # Verificação de quebra de página preventiva (se restar menos de 60mm)
-        if pdf.get_y() > 230: 
-            pdf.add_page()
-            
-        # 1. Cabeçalho do Bloco de Teste
-        pdf.set_font('helvetica', 'B', 11)
-        pdf.set_fill_color(44, 62, 80)
-        pdf.set_text_color(255, 255, 255)
-        pdf.cell(largura_util, 10, f" {r['ID']} | {r['Titulo']}", fill=True, new_x=XPos.LMARGIN, new_y=YPos.NEXT)
-        
-        # 2. Linha de Status e Módulo (Com Cores)
-        pdf.set_text_color(0, 0, 0)
-        pdf.set_font('helvetica', 'B', 9)
-        pdf.cell( largura_util * 0.5, 8, f" MÓDULO: {r['Funcionalidade']}", border='B')
-        
-        # Define a cor do texto do Status
-        status_color = (75, 76, 106) # Cor padrão (Pendente)
-        if r['Status'] == "OK": status_color = (30, 130, 76) # Verde
-        elif r['Status'] == "Falha": status_color = (120, 0, 150) # Roxo
-        
-        pdf.set_text_color(*status_color)
-        pdf.cell(largura_util * 0.5, 8, f" STATUS: {r['Status']}", border='B', new_x=XPos.LMARGIN, new_y=YPos.NEXT)
-        
-        # 3. Passos (Reseta cursor para a margem esquerda)
-        pdf.set_text_color(0, 0, 0)
-        pdf.ln(2)
-        pdf.set_font('helvetica', 'B', 9)
-        pdf.set_x(pdf.l_margin)
-        pdf.cell(largura_util, 7, "Passos:", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
-        
-        pdf.set_font('helvetica', '', 9)
-        texto_passos = str(r['Passos']) if r['Passos'] and str(r['Passos']) != 'None' else "N/A"
-        pdf.multi_cell(largura_util, 5, texto_passos, new_x=XPos.LMARGIN, new_y=YPos.NEXT)
-        
-        # 4. Resultado Esperado
-        pdf.ln(1)
-        pdf.set_font('helvetica', 'B', 9)
-        pdf.set_x(pdf.l_margin)
-        pdf.cell(largura_util, 7, "Resultado Esperado:", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
-        
-        pdf.set_font('helvetica', '', 9)
-        texto_esperado = str(r['Esperado']) if r['Esperado'] and str(r['Esperado']) != 'None' else "N/A"
-        pdf.multi_cell(largura_util, 5, texto_esperado, new_x=XPos.LMARGIN, new_y=YPos.NEXT)
-
-        # 5. Observações (Se existirem)
-        if r['Observacao'] and str(r['Observacao']) != 'None':
-            pdf.ln(2)
-            pdf.set_font('helvetica', 'I', 9)
-            pdf.set_text_color(150, 0, 0) # Texto em tom avermelhado para avisos
-            pdf.set_x(pdf.l_margin)
-            pdf.multi_cell(largura_util, 5, f"Obs: {r['Observacao']}", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
-            pdf.set_text_color(0, 0, 0)
-
-        # 6. Evidências (Imagens do Supabase Storage)
-        current_evs = [e['caminho'] for e in evs_data if e['test_id'] == r['ID']]
-        if current_evs:
-            pdf.ln(3)
-            for url in current_evs:
-                try:
-                    img_content = requests.get(url, timeout=10).content
-                    with tempfile.NamedTemporaryFile(delete=False, suffix=".png") as tmp:
-                        tmp.write(img_content)
-                        tmp_path = tmp.name
-                    
-                    # Centralização lógica da imagem (Página tem 210mm, margens 15mm cada)
-                    # Imagem com 140mm de largura
-                    pdf.image(tmp_path, x=35, w=140) 
-                    pdf.ln(2)
-                    os.unlink(tmp_path)
-                except:
-                    pdf.set_font('helvetica', 'I', 8)
-                    pdf.cell(largura_util, 5, " [Evidência anexada, mas não pôde ser carregada no PDF] ", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
-        
-        pdf.ln(10) # Espaçamento final entre blocos de teste
-            
-    return bytes(pdf.output())
+@st.cache_resource
+def get_fila_relatorios():
+    return FilaRelatorios()
+
+@st.fragment(run_every=1)
+def acompanhar_relatorio():
+    # Consulta o job de relatório da sessão; ao terminar, entrega os bytes e recarrega a página
+    estado, prog, resultado = get_fila_relatorios().status(st.session_state['pdf_job'])
+    if estado == "executando":
+        total, feitas = prog.get("total_evidencias", 0), prog.get("evidencias", 0)
+        st.progress(feitas / total if total else 0.0,
+                    text=f"Gerando relatório ({prog.get('fase', '')}) - páginas: {prog.get('paginas', 0)} | evidências: {feitas}/{total}")
+        return
+
+    del st.session_state['pdf_job']
+    if estado == "concluido":
+        st.session_state['pdf_final'], st.session_state['pdf_falhas'], st.session_state['pdf_metricas'] = resultado
+    elif estado == "erro":
+        st.session_state['pdf_erro'] = str(resultado)
+    st.rerun()
+
+def grid_paginado(chave, tabela, exec_id, col_map, campos_busca, resumo):
+    """Filtros + página atual de um grid. Retorna (DataFrame da página, chave do editor)."""
+    def voltar_pagina_1(): st.session_state[f"{chave}_pagina"] = 1
+
+    funcs_opcoes = sorted(resumo["Funcionalidade"].unique())  # inclui "Sem módulo" (funcionalidade vazia)
+    c1, c2, c3, c4 = st.columns([2, 2, 3, 1])
+    funcs = c1.multiselect("Funcionalidade", funcs_opcoes, key=f"{chave}_func", on_change=voltar_pagina_1)
+    stats = c2.multiselect("Status", STATUS_OPCOES, key=f"{chave}_status", on_change=voltar_pagina_1)
+    busca = c3.text_input("Buscar", key=f"{chave}_busca", on_change=voltar_pagina_1).strip()
+    tamanho = c4.selectbox("Linhas", TAMANHOS_PAGINA, key=f"{chave}_tamanho", on_change=voltar_pagina_1)
+
+    pagina = st.session_state.get(f"{chave}_pagina", 1)
+    df, total = carregar_pagina(tabela, exec_id, col_map, campos_busca, pagina, tamanho, funcs, stats, busca)
+    n_paginas = max(1, math.ceil(total / tamanho))
+    if pagina > n_paginas:
+        pagina = n_paginas
+        df, total = carregar_pagina(tabela, exec_id, col_map, campos_busca, pagina, tamanho, funcs, stats, busca)
+    st.session_state[f"{chave}_pagina"] = pagina
+
+    p1, p2 = st.columns([1, 5])
+    p1.number_input("Página", min_value=1, max_value=n_paginas, step=1, key=f"{chave}_pagina")
+    p2.caption(f"{total} registro(s) | página {pagina} de {n_paginas}")
+    return df, f"{chave}_{pagina}_{tamanho}_{abs(hash((tuple(funcs), tuple(stats), busca)))}"
 
 # --- LOGIN ---
 if 'user' not in st.session_state: st.session_state['user'] = None
@@ -214,9 +80,9 @@ if st.session_state['user'] is None:
         em = st.text_input("E-mail corporativo")
         pw = st.text_input("Senha", type="password")
         if st.button("Acessar", use_container_width=True):
-            u = supabase.table("usuarios").select("*").eq("email", em).eq("senha", pw).execute()
-            if u.data:
-                st.session_state['user'] = u.data[0]
+            u = autenticar(em, pw)
+            if u:
+                st.session_state['user'] = u
                 st.rerun()
             else: st.error("Acesso negado.")
     st.stop()
@@ -230,132 +96,138 @@ with st.sidebar:
     with st.form("new_ciclo"):
         t = st.text_input("Título do Novo Ciclo")
         if st.form_submit_button("Criar Ciclo", use_container_width=True):
-            supabase.table("execucoes").insert({"user_id": user['id'], "titulo": t, "data": datetime.now().strftime("%Y-%m-%d")}).execute()
+            criar_execucao(user, t)
             st.rerun()
     
-    q_execs = supabase.table("execucoes").select("*")
-    if not user['pode_ver_todos']: q_execs = q_execs.eq("user_id", user['id'])
-    execs_data = q_execs.execute().data
-    df_execs = pd.DataFrame(execs_data)
+    df_execs = pd.DataFrame(listar_execucoes(user))
     ciclo_ativo = st.selectbox("Ciclo Ativo", df_execs['titulo'].tolist() if not df_execs.empty else ["Nenhum"])
 
+    painel_metricas = None
+    if user['pode_ver_todos']:
+        with st.expander("Pool de conexões"):
+            st.dataframe(estatisticas_pool(), hide_index=True, use_container_width=True)
+        if st.toggle("Instrumentação", key="ver_metricas"):
+            painel_metricas = st.empty()  # preenchido no fim do script, com os totais do rerun inteiro
+
 if ciclo_ativo != "Nenhum":
     exec_id = int(df_execs[df_execs['titulo'] == ciclo_ativo]['id'].values[0])
     
-    # Buscar Dados (Sincronizando campos revisados)
-    crits_data = supabase.table("criterios").select("crit_id, funcionalidade, descricao, tipo, prioridade, responsavel, status").eq("exec_id", exec_id).execute().data
-    df_c = pd.DataFrame(crits_data) if crits_data else pd.DataFrame(columns=['ID','Funcionalidade','Descricao','Tipo','Prioridade','Responsavel','Status'])
-    if crits_data: df_c.columns = ['ID','Funcionalidade','Descricao','Tipo','Prioridade','Responsavel','Status']
-
-    tests_data = supabase.table("casos_teste").select("test_id, funcionalidade, titulo, passos, esperado, status, observacao").eq("exec_id", exec_id).execute().data
-    df_t = pd.DataFrame(tests_data) if tests_data else pd.DataFrame(columns=['ID','Funcionalidade','Titulo','Passos','Esperado','Status','Observacao'])
-    if tests_data: df_t.columns = ['ID','Funcionalidade','Titulo','Passos','Esperado','Status','Observacao']
+    # Buscar Dados (critérios e casos de teste são paginados em cada aba)
+    df_bugs = carregar_bugs(exec_id)
 
-    bugs_data = supabase.table("bugs").select("*").eq("exec_id", exec_id).execute().data
-    df_bugs = pd.DataFrame(bugs_data) if bugs_data else pd.DataFrame(columns=['id', 'titulo', 'descricao', 'aplicacao', 'ambiente', 'prioridade', 'funcionalidade', 'status', 'id_externo', 'status_integracao'])
-
-    tabs = st.tabs(["Dashboard", "Critérios", "Execução", "Exportar", "Bugs"])
+    tabs = st.tabs(["Dashboard", "Critérios", "Execução", "Exportar", "Bugs", "Importar", "Tendências"])
 
     with tabs[0]:
         st.subheader(f"QA Governance - {ciclo_ativo}")
-        if not df_t.empty:
+        df_res_t = resumo_testes(exec_id)
+        if not df_res_t.empty:
             c1, c2 = st.columns(2)
-            fig_pie = px.pie(df_t, names='Status', title="Status Geral", color='Status', color_discrete_map=CORES_GRAF, hole=0.5)
+            fig_pie = px.pie(df_res_t, names='Status', values='qtd', title="Status Geral", color='Status', color_discrete_map=CORES_GRAF, hole=0.5)
             c1.plotly_chart(fig_pie, use_container_width=True)
-            fig_bar = px.bar(df_t, x='Funcionalidade', color='Status', title="Módulos", color_discrete_map=CORES_GRAF)
+            fig_bar = px.bar(df_res_t, x='Funcionalidade', y='qtd', color='Status', title="Módulos", color_discrete_map=CORES_GRAF)
             c2.plotly_chart(fig_bar, use_container_width=True)
 
-    if not df_bugs.empty:
-        st.divider()
-        st.subheader("Indicadores de Defeitos")
-        c1, c2 = st.columns(2)
-        
-        fig_bugs_prio = px.pie(df_bugs, names='prioridade', title="Bugs por Prioridade", hole=0.4)
-        c1.plotly_chart(fig_bugs_prio, use_container_width=True)
-        
-        fig_bugs_status = px.bar(df_bugs, x='status', color='status_integracao', title="Status de Correção vs Integração")
-        c2.plotly_chart(fig_bugs_status, use_container_width=True)            
+        df_res_b = resumo_bugs(exec_id)
+        if not df_res_b.empty:
+            st.divider()
+            st.subheader("Indicadores de Defeitos")
+            c1, c2 = st.columns(2)
+
+            fig_bugs_prio = px.pie(df_res_b, names='prioridade', values='qtd', title="Bugs por Prioridade", hole=0.4)
+            c1.plotly_chart(fig_bugs_prio, use_container_width=True)
+
+            fig_bugs_status = px.bar(df_res_b, x='status', y='qtd', color='status_integracao', title="Status de Correção vs Integração")
+            c2.plotly_chart(fig_bugs_status, use_container_width=True)
 
     with tabs[1]:
         st.subheader(f"Critérios de Aceite - {ciclo_ativo}")
-        if st.button("➕ Novo Critério"):
-            nid = get_next_auto_id("CA", "criterios", "crit_id", exec_id)
-            supabase.table("criterios").insert({"exec_id": exec_id, "crit_id": nid, "status": "Pendente"}).execute()
+        n1, n2, n3 = st.columns([1, 3, 2], vertical_alignment="bottom")
+        qtd_c = n1.number_input("Quantidade", min_value=1, max_value=1000, value=1, key="qtd_novos_c")
+        func_c = n2.text_input("Funcionalidade (opcional)", key="func_novos_c")
+        if n3.button("➕ Novo Critério", use_container_width=True):
+            criar_em_lote("criterios", COLS_CRITERIOS, "CA", exec_id, int(qtd_c), func_c.strip())
             st.rerun()
         
-        ed_c = st.data_editor(df_c, key="ed_c", num_rows="dynamic", use_container_width=True,
+        df_c, key_c = grid_paginado("ed_c", "criterios", exec_id, COLS_CRITERIOS, BUSCA_CRITERIOS, resumo_criterios(exec_id))
+        ed_c = st.data_editor(df_c, key=key_c, num_rows="dynamic", use_container_width=True,
                              column_config={"Status": st.column_config.SelectboxColumn("Status", options=STATUS_OPCOES),
                                            "Prioridade": st.column_config.SelectboxColumn("Prioridade", options=PRIORIDADE_OPCOES)})
         
         if st.button("Salvar Critérios", use_container_width=True):
-            supabase.table("criterios").delete().eq("exec_id", exec_id).execute()
-            for _, r in ed_c.iterrows():
-                supabase.table("criterios").insert({
-                    "exec_id": exec_id, "crit_id": r['ID'], "funcionalidade": r.get('Funcionalidade',''),
-                    "descricao": r.get('Descricao',''), "tipo": r.get('Tipo',''), 
-                    "prioridade": r.get('Prioridade',''), "responsavel": r.get('Responsavel',''), "status": r.get('Status','Pendente')
-                }).execute()
-            st.success("Sincronizado!")
+            try:
+                n_upd, n_del = salvar_diff("criterios", exec_id, COLS_CRITERIOS, "CA", df_c, ed_c)
+                st.success(f"Sincronizado! {n_upd} gravado(s), {n_del} removido(s).")
+            except IdEmUso as e:
+                st.error(f"Nada foi gravado. {e}")
 
     with tabs[2]:
         st.subheader(f"Casos de Teste - {ciclo_ativo}")
-        if st.button("➕ Novo Caso de Teste"):
-            nid = get_next_auto_id("CT", "casos_teste", "test_id", exec_id)
-            supabase.table("casos_teste").insert({"exec_id": exec_id, "test_id": nid, "status": "Pendente"}).execute()
+        n1, n2, n3 = st.columns([1, 3, 2], vertical_alignment="bottom")
+        qtd_t = n1.number_input("Quantidade", min_value=1, max_value=1000, value=1, key="qtd_novos_t")
+        func_t = n2.text_input("Funcionalidade (opcional)", key="func_novos_t")
+        if n3.button("➕ Novo Caso de Teste", use_container_width=True):
+            criar_em_lote("casos_teste", COLS_TESTES, "CT", exec_id, int(qtd_t), func_t.strip())
             st.rerun()
         
-        ed_t = st.data_editor(df_t, key="ed_t", num_rows="dynamic", use_container_width=True,
+        df_t, key_t = grid_paginado("ed_t", "casos_teste", exec_id, COLS_TESTES, BUSCA_TESTES, resumo_testes(exec_id))
+        ed_t = st.data_editor(df_t, key=key_t, num_rows="dynamic", use_container_width=True,
                              column_config={"Status": st.column_config.SelectboxColumn("Status", options=STATUS_OPCOES)})
         
         if st.button("Salvar Execução", use_container_width=True):
-            supabase.table("casos_teste").delete().eq("exec_id", exec_id).execute()
-            for _, r in ed_t.iterrows():
-                supabase.table("casos_teste").insert({
-                    "exec_id": exec_id, "test_id": r['ID'], "funcionalidade": r.get('Funcionalidade',''),
-                    "titulo": r.get('Titulo',''), "passos": r.get('Passos',''), 
-                    "esperado": r.get('Esperado',''), "status": r.get('Status','Pendente'), "observacao": r.get('Observacao','')
-                }).execute()
-            st.success("Sincronizado!")
+            try:
+                n_upd, n_del = salvar_diff("casos_teste", exec_id, COLS_TESTES, "CT", df_t, ed_t)
+                st.success(f"Sincronizado! {n_upd} gravado(s), {n_del} removido(s).")
+            except IdEmUso as e:
+                st.error(f"Nada foi gravado. {e}")
 
     with tabs[3]:
         st.subheader("Anexos na Nuvem")
-        target = st.selectbox("ID do Teste", df_t['ID'].tolist() if not df_t.empty else [])
-        img = st.file_uploader("Upload de Evidência", type=['png','jpg','jpeg'])
-        if st.button("Vincular ao Caso de Teste") and img:
-            file_path = f"{exec_id}/{target}_{img.name}"
-            supabase.storage.from_("evidencias").upload(file_path, img.getvalue(), {"upsert": "true"})
-            url = supabase.storage.from_("evidencias").get_public_url(file_path)
-            supabase.table("evidencias").insert({"exec_id": exec_id, "test_id": target, "caminho": url, "data": datetime.now().strftime("%Y-%m-%d")}).execute()
-            st.success("Evidência salva no Storage!")
-
-        if st.button("Gerar Relatório PDF", use_container_width=True):
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".png") as t1, tempfile.NamedTemporaryFile(delete=False, suffix=".png") as t2:
-                for f in [fig_pie, fig_bar]: f.update_layout(paper_bgcolor='white', plot_bgcolor='white')
-                fig_pie.write_image(t1.name, engine="kaleido", scale=2)
-                fig_bar.write_image(t2.name, engine="kaleido", scale=2)
-                pdf_data = gerar_pdf_completo(ciclo_ativo, df_t, df_c, exec_id, t1.name, t2.name)
-                st.session_state['pdf_final'] = pdf_data
-                st.success("PDF gerado!")
+        ids_testes = listar_ids_testes(exec_id)
+        imgs = st.file_uploader("Upload de Evidências", type=['png','jpg','jpeg'], accept_multiple_files=True)
+        pelo_nome = st.checkbox("Associar pelo ID no nome do arquivo (ex.: CT-012_login.png)")
+        targets = st.multiselect("IDs dos Testes", ids_testes, disabled=pelo_nome)
+        comprimir = st.checkbox("Comprimir imagens antes do envio", value=True)
+        if st.button("Vincular aos Casos de Teste", disabled=not imgs or not (pelo_nome or targets)):
+            arquivos = [(img.name, img.getvalue(), ids_no_nome(img.name, ids_testes) if pelo_nome else targets) for img in imgs]
+            with st.spinner(f"Enviando {len(arquivos)} arquivo(s)..."):
+                n_vinc, n_env, n_exist, falhas_up = anexar_evidencias(exec_id, arquivos, comprimir)
+            st.success(f"{n_vinc} evidência(s) vinculada(s): {n_env} arquivo(s) enviado(s), {n_exist} já existente(s) no Storage.")
+            if falhas_up:
+                st.warning(f"{len(falhas_up)} arquivo(s) não vinculado(s).")
+                st.dataframe(pd.DataFrame(falhas_up, columns=["Arquivo", "Motivo"]), hide_index=True)
+
+        if st.button("Gerar Relatório PDF", use_container_width=True, disabled='pdf_job' in st.session_state):
+            try:
+                st.session_state['pdf_job'] = get_fila_relatorios().submeter(montar_snapshot(exec_id, ciclo_ativo))
+                st.session_state.pop('pdf_final', None)
+                st.rerun()
+            except FilaCheia as e:
+                st.warning(f"Servidor ocupado gerando relatórios. Tente novamente em instantes. ({e})")
+
+        if 'pdf_job' in st.session_state:
+            acompanhar_relatorio()
+        if 'pdf_erro' in st.session_state:
+            st.error(f"Falha ao gerar o relatório: {st.session_state.pop('pdf_erro')}")
+        if st.session_state.get('pdf_falhas'):
+            falhas_evs = st.session_state['pdf_falhas']
+            st.warning(f"{len(falhas_evs)} evidência(s) não puderam ser incluídas no PDF.")
+            st.dataframe(pd.DataFrame(falhas_evs, columns=["Teste", "URL", "Motivo"]), hide_index=True)
 
         if 'pdf_final' in st.session_state:
             st.download_button("Baixar PDF", st.session_state['pdf_final'], f"QA_{ciclo_ativo}.pdf", use_container_width=True)
 
     with tabs[4]: # Aba de Bugs
         st.subheader(f"Gestão de Bugs - {ciclo_ativo}")
-        
-        # Busca Bugs vinculados a esta execução
-        bugs_data = supabase.table("bugs").select("*").eq("exec_id", exec_id).execute().data
-        df_bugs = pd.DataFrame(bugs_data) if bugs_data else pd.DataFrame(columns=[
-            'id', 'titulo', 'descricao', 'aplicacao', 'ambiente', 'prioridade', 
-            'funcionalidade', 'status', 'id_externo', 'status_integracao'
-        ])  
+
+        # df_bugs já foi carregado (via cache) antes das abas
 
         # --- Formulário de Cadastro ---
         with st.expander("➕ Reportar Novo Bug"):
             with st.form("form_bug"):
                 col1, col2 = st.columns(2)
                 b_titulo = col1.text_input("Título do Bug")
-                b_func = col2.selectbox("Funcionalidade (Módulo)", df_t['Funcionalidade'].unique() if not df_t.empty else ["Geral"])
+                funcs_ciclo = resumo_testes(exec_id)["Funcionalidade"].unique().tolist()
+                b_func = col2.selectbox("Funcionalidade (Módulo)", funcs_ciclo or ["Geral"])
                 b_desc = st.text_area("Descrição Detalhada / Passos para Reproduzir")
                 
                 c3, c4, c5 = st.columns(3)
@@ -365,16 +237,14 @@ if ciclo_ativo != "Nenhum":
                 
                 if st.form_submit_button("Registrar Bug", use_container_width=True):
                     new_bug = {
-                        "exec_id": exec_id,
                         "titulo": b_titulo,
                         "funcionalidade": b_func,
                         "descricao": b_desc,
                         "aplicacao": b_app,
                         "ambiente": b_amb,
                         "prioridade": b_prio,
-                        "status": "Novo"
                     }
-                    supabase.table("bugs").insert(new_bug).execute()
+                    registrar_bug(exec_id, new_bug)
                     st.success("Bug registrado com sucesso!")
                     st.rerun()  
 
@@ -390,7 +260,7 @@ if ciclo_ativo != "Nenhum":
                 column_config={
                     "id": None, # Oculta o ID interno
                     "exec_id": None,
-                    "status": st.column_config.SelectboxColumn("Status", options=["Novo", "Em Correção", "Validado", "Cancelado"]),
+                    "status": st.column_config.SelectboxColumn("Status", options=STATUS_BUGS),
                     "prioridade": st.column_config.SelectboxColumn("Prioridade", options=PRIORIDADE_OPCOES),
                     "status_integracao": st.column_config.TextColumn("Status Integração", disabled=True),
                     "id_externo": st.column_config.TextColumn("ID Externo (Jira/Azure)")
@@ -399,23 +269,84 @@ if ciclo_ativo != "Nenhum":
             )   
 
             if st.button("Salvar Alterações nos Bugs", use_container_width=True):
-                for _, row in ed_bugs.iterrows():
-                    # Lógica de Integração Automática solicitada
-                    status_int = "Integrado" if row['id_externo'] and str(row['id_externo']).strip() != "" else "Nao Integrado"
-                    
-                    upd_data = {
-                        "titulo": row['titulo'],
-                        "descricao": row['descricao'],
-                        "aplicacao": row['aplicacao'],
-                        "ambiente": row['ambiente'],
-                        "prioridade": row['prioridade'],
-                        "status": row['status'],
-                        "id_externo": row['id_externo'],
-                        "status_integracao": status_int
-                    }
-                    supabase.table("bugs").update(upd_data).eq("id", row['id']).execute()
-                
-                st.success("Bugs atualizados!")
+                n_bugs = salvar_bugs(exec_id, df_bugs, ed_bugs)
+                st.success(f"{n_bugs} bug(s) atualizado(s)!")
                 st.rerun()
         else:
-            st.info("Nenhum bug reportado para este ciclo.")
\ No newline at end of file
+            st.info("Nenhum bug reportado para este ciclo.")
+
+    with tabs[5]: # Importação de planilhas
+        st.subheader(f"Importar Planilha - {ciclo_ativo}")
+        destinos = {"Casos de Teste": "casos_teste", "Critérios": "criterios", "Bugs": "bugs"}
+        destino = destinos[st.selectbox("Importar para", list(destinos))]
+        if destino == "bugs":
+            regra = ("Bugs com id_externo já registrado no ciclo são atualizados; bugs sem id_externo são sempre"
+                     " inseridos, então importar a mesma planilha de novo os duplica.")
+        else:
+            regra = ("Linhas sem ID recebem numeração automática; IDs existentes são atualizados só nas colunas"
+                     " presentes no arquivo.")
+        st.caption("Colunas reconhecidas: " + ", ".join(a[0] for a in IMPORT_COLUNAS[destino].values())
+                   + f" (obrigatória: {', '.join(IMPORT_OBRIGATORIAS[destino])}). " + regra)
+        arq = st.file_uploader("Arquivo CSV ou XLSX", type=["csv", "xlsx"], key="arq_import")
+
+        if st.button("Importar", use_container_width=True, disabled=arq is None):
+            barra = st.progress(0.0, text="Importando...")
+            # Estimativa de linhas só para a barra de progresso
+            total_est = max(1, arq.getvalue().count(b"\n")) if arq.name.lower().endswith(".csv") else None
+            def atualizar_barra(lidas, gravadas):
+                fracao = min(1.0, lidas / total_est) if total_est else 0.0
+                barra.progress(fracao, text=f"{lidas} linha(s) lida(s), {gravadas} gravada(s)")
+
+            try:
+                n_ok, df_erros, n_erros = importar_arquivo(arq, arq.name, destino, exec_id, atualizar_barra)
+            except ArquivoInvalido as e:
+                barra.empty()
+                st.error(f"Arquivo recusado: {e}")
+            else:
+                barra.progress(1.0, text="Importação concluída")
+                st.success(f"{n_ok} linha(s) importada(s).")
+                if n_erros:
+                    st.warning(f"{n_erros} linha(s) rejeitada(s).")
+                    st.dataframe(df_erros.head(500), hide_index=True, use_container_width=True)
+                    st.download_button("Baixar relatório de erros", df_erros.to_csv(index=False).encode("utf-8-sig"),
+                                       f"erros_importacao_{ciclo_ativo}.csv", use_container_width=True)
+
+    with tabs[6]: # Tendências entre ciclos (lê só resumo_ciclos, uma linha por ciclo)
+        st.subheader("Tendências entre Ciclos")
+        df_tend = carregar_tendencias(user)
+        qtd_ciclos = st.selectbox("Ciclos exibidos (mais recentes)", [20, 50, 200, "Todos"], index=1, key="tend_qtd")
+        if qtd_ciclos != "Todos": df_tend = df_tend.tail(qtd_ciclos)
+        if df_tend.empty or not df_tend["testes_total"].any():
+            st.info("Ainda não há casos de teste registrados nos ciclos visíveis.")
+        else:
+            df_tend = df_tend.assign(Ciclo=df_tend["titulo"].astype(str) + " #" + df_tend["exec_id"].astype(str))
+            fig_taxas = px.line(df_tend, x="Ciclo", y=["taxa_aprovacao", "progresso"], markers=True,
+                                title="Aprovação e Progresso (%)", labels={"value": "%", "variable": ""})
+            st.plotly_chart(fig_taxas, use_container_width=True)
+
+            c1, c2 = st.columns(2)
+            df_status = df_tend.rename(columns={"testes_ok": "OK", "testes_falha": "Falha", "testes_bloqueado": "Bloqueado",
+                                                "testes_pendente": "Pendente", "testes_na": "N/A"})
+            fig_status = px.bar(df_status, x="Ciclo", y=["OK", "Falha", "Bloqueado", "Pendente", "N/A"], title="Casos por Status",
+                                color_discrete_map=CORES_GRAF, labels={"value": "Casos", "variable": "Status"})
+            c1.plotly_chart(fig_status, use_container_width=True)
+            fig_defeitos = px.bar(df_tend, x="Ciclo", y=["bugs_abertos", "bugs_criticos"], barmode="group",
+                                  title="Bugs Abertos por Ciclo", labels={"value": "Bugs", "variable": ""})
+            c2.plotly_chart(fig_defeitos, use_container_width=True)
+
+            st.dataframe(df_tend.drop(columns=["Ciclo"]), hide_index=True, use_container_width=True)
+
+# --- INSTRUMENTAÇÃO (admin) ---
+if painel_metricas is not None:
+    with painel_metricas.container():
+        eventos = medicoes.tabela()
+        chamadas = eventos[eventos["tipo"].isin(["supabase", "storage"])]
+        st.caption(f"Rerun: {medicoes.duracao_ms():.0f} ms | Supabase: {len(chamadas)} chamada(s), "
+                   f"{chamadas['ms'].sum():.0f} ms, {int(chamadas['linhas'].fillna(0).sum())} linha(s), "
+                   f"{chamadas['bytes'].fillna(0).sum() / 1024:.1f} KB | cache: {(eventos['tipo'] == 'cache').sum()} acerto(s)")
+        st.dataframe(medicoes.totais(), hide_index=True, use_container_width=True)
+        with st.expander("Chamadas do rerun"):
+            st.dataframe(eventos, hide_index=True, use_container_width=True)
+        if st.session_state.get('pdf_metricas') is not None:
+            st.caption("Último relatório PDF")
+            st.dataframe(st.session_state['pdf_metricas'], hide_index=True, use_container_width=True)
@@ -0,0 +1,225 @@
+import io
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import statistics
+import tracemalloc
+
+import pandas as pd
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import qa_dados
+from qa_dados import COLS_CRITERIOS, COLS_TESTES, BUSCA_CRITERIOS, BUSCA_TESTES, STATUS_OPCOES, PRIORIDADE_OPCOES, STATUS_BUGS
+from qa_relatorio import gerar_pdf_completo
+from fake_supabase import FakeSupabase, SessaoEvidencias
+
+# Benchmark do QA Governance com ciclos sintéticos sobre um Supabase em memória (fake_supabase.py).
+#   python benchmarks/bench_ciclos.py                          # 100, 1k, 10k e 50k casos de teste
+#   python benchmarks/bench_ciclos.py --tamanhos 100 1000 --json base.json
+#   python benchmarks/bench_ciclos.py --tamanhos 100 1000 --comparar base.json   # sai com 1 se houver regressão
+# Mede latência (mediana das repetições), pico de memória (tracemalloc) e chamadas ao Supabase por cenário.
+
+EXEC_ID = 1
+USUARIO = {"id": 1, "nome": "Benchmark", "pode_ver_todos": True}
+MODULOS = ["Login", "Cadastro", "Busca", "Carrinho", "Pagamento", "Pedidos", "Relatórios", "Notificações",
+           "Perfil", "Administração", "Integrações", "Auditoria"]
+PESOS_STATUS = {"OK": 50, "Falha": 10, "Pendente": 20, "Em Execucao": 10, "Bloqueado": 5, "N/A": 5}
+PAGINA = 25          # página inicial dos grids, como na interface
+PAGINA_EDICAO = 250  # maior página do grid: o pior caso de um salvamento
+
+def imagem_evidencia(rng, largura=320, altura=200):
+    """JPEG sintético de screenshot: fundo, barras de 'texto' e ruído para não comprimir demais."""
+    img = Image.new("RGB", (largura, altura), tuple(rng.randrange(180, 256) for _ in range(3)))
+    pixels = img.load()
+    for y in range(10, altura - 10, 14):
+        fim = rng.randrange(largura // 3, largura - 10)
+        for x in range(10, fim):
+            for dy in range(6): pixels[x, y + dy] = (40, 40, 40) if rng.random() > 0.1 else (200, 200, 200)
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=80)
+    return buf.getvalue()
+
+def popular(banco, n_testes, frac_evidencias, semente=42):
+    """Cria um ciclo com `n_testes` casos, n/10 critérios, n/20 bugs e evidências em `frac_evidencias` dos casos."""
+    rng = random.Random(semente)
+    status, pesos = list(PESOS_STATUS), list(PESOS_STATUS.values())
+    banco.tabelas["usuarios"].append({"id": 1, "nome": "Benchmark", "email": "bench@qa", "senha": "x", "pode_ver_todos": True})
+    banco.tabelas["execucoes"].append({"id": EXEC_ID, "user_id": 1, "titulo": f"Ciclo {n_testes}", "data": "2026-01-01"})
+
+    testes = []
+    for i in range(1, n_testes + 1):
+        status_caso = rng.choices(status, pesos)[0]
+        testes.append({"exec_id": EXEC_ID, "test_id": f"CT-{i:03}", "funcionalidade": rng.choice(MODULOS),
+                       "titulo": f"Validar fluxo {i} do módulo", "status": status_caso,
+                       "passos": "\n".join(f"{p}. Executar a ação {p} do roteiro" for p in range(1, rng.randint(3, 7))),
+                       "esperado": "O sistema conclui a operação sem erros e exibe a mensagem de confirmação.",
+                       "observacao": "Comportamento divergente registrado em bug." if status_caso == "Falha" else None})
+    banco.gravar("casos_teste", testes)
+
+    banco.gravar("criterios", [
+        {"exec_id": EXEC_ID, "crit_id": f"CA-{i:03}", "funcionalidade": rng.choice(MODULOS),
+         "descricao": f"Critério de aceite {i}: a funcionalidade atende à regra de negócio {i}.",
+         "tipo": rng.choice(["Funcional", "Não funcional"]), "prioridade": rng.choice(PRIORIDADE_OPCOES),
+         "responsavel": rng.choice(["Ana", "Bruno", "Carla"]), "status": rng.choices(status, pesos)[0]}
+        for i in range(1, max(1, n_testes // 10) + 1)])
+
+    banco.gravar("bugs", [
+        {"exec_id": EXEC_ID, "titulo": f"Bug {i}", "descricao": "Passos para reproduzir...", "aplicacao": "Web",
+         "ambiente": "Homologação", "prioridade": rng.choice(PRIORIDADE_OPCOES), "funcionalidade": rng.choice(MODULOS),
+         "status": rng.choice(STATUS_BUGS), "id_externo": f"JIRA-{i}" if rng.random() < 0.5 else None,
+         "status_integracao": None}
+        for i in range(1, max(1, n_testes // 20) + 1)])
+
+    bucket = banco.storage.from_("evidencias")
+    evidencias = []
+    for t in rng.sample(testes, int(n_testes * frac_evidencias)):
+        caminho = f"{EXEC_ID}/{t['test_id']}_tela.jpg"
+        bucket.upload(caminho, imagem_evidencia(rng))
+        evidencias.append({"exec_id": EXEC_ID, "test_id": t["test_id"], "caminho": bucket.get_public_url(caminho),
+                           "data": "2026-01-01"})
+    banco.gravar("evidencias", evidencias)
+
+def limpar_cache():
+    for tabela in ["execucoes", "casos_teste", "criterios", "bugs", "evidencias"]:
+        qa_dados.invalidar(tabela)
+
+# --- CENÁRIOS: cada um é (preparar, executar); só `executar` é medido ---
+def cenario_dashboard(quente):
+    def preparar():
+        if not quente: limpar_cache()
+    def executar(_):
+        # Mesmas leituras do primeiro render da interface: ciclos, bugs, resumos e a 1ª página de cada grid
+        qa_dados.listar_execucoes(USUARIO)
+        qa_dados.carregar_bugs(EXEC_ID)
+        qa_dados.resumo_testes(EXEC_ID)
+        qa_dados.resumo_bugs(EXEC_ID)
+        qa_dados.resumo_criterios(EXEC_ID)
+        qa_dados.carregar_pagina("criterios", EXEC_ID, COLS_CRITERIOS, BUSCA_CRITERIOS, 1, PAGINA)
+        qa_dados.carregar_pagina("casos_teste", EXEC_ID, COLS_TESTES, BUSCA_TESTES, 1, PAGINA)
+        qa_dados.listar_ids_testes(EXEC_ID)
+    return preparar, executar
+
+def cenario_salvar_grid(tabela, col_map, busca, prefixo, rng):
+    def preparar():
+        # Página editada no data_editor: ~10% de status alterados, uma linha removida e uma nova sem ID
+        df, _ = qa_dados.carregar_pagina(tabela, EXEC_ID, col_map, busca, 1, PAGINA_EDICAO)
+        ed = df.copy()
+        alterar = ed.sample(frac=0.1, random_state=rng.randrange(10**6)).index
+        ed.loc[alterar, "Status"] = [rng.choice(STATUS_OPCOES) for _ in alterar]
+        ed = ed.drop(ed.index[-1:])
+        novo = {c: None for c in ed.columns}
+        novo.update({"Funcionalidade": "Login", "Status": "Pendente"})
+        ed = pd.concat([ed, pd.DataFrame([novo])], ignore_index=True)
+        return df, ed
+    def executar(args):
+        df, ed = args
+        qa_dados.salvar_diff(tabela, EXEC_ID, col_map, prefixo, df, ed)
+    return preparar, executar
+
+def cenario_salvar_bugs(rng):
+    def preparar():
+        df = qa_dados.carregar_bugs(EXEC_ID)
+        ed = df.copy()
+        alterar = ed.sample(frac=0.1, random_state=rng.randrange(10**6)).index
+        ed.loc[alterar, "status"] = [rng.choice(STATUS_BUGS) for _ in alterar]
+        return df, ed
+    def executar(args):
+        qa_dados.salvar_bugs(EXEC_ID, *args)
+    return preparar, executar
+
+def cenario_pdf(banco):
+    def preparar():
+        limpar_cache()
+        return qa_dados.montar_snapshot(EXEC_ID, "Benchmark")
+    def executar(snap):
+        falhas = []
+        gerar_pdf_completo(snap["ciclo_nome"], snap["df_testes"], snap["df_crits"], snap["evs_data"], None, None,
+                           falhas=falhas, sessao=SessaoEvidencias(banco), agregado=snap["agregado"])
+        if falhas: raise RuntimeError(f"{len(falhas)} evidência(s) não incluída(s) no PDF")
+    return preparar, executar
+
+def medir(banco, preparar, executar, repeticoes, memoria):
+    tempos, picos, chamadas, linhas = [], [], 0, 0
+    for _ in range(repeticoes):
+        args = preparar()
+        banco.zerar_contagem()
+        if memoria: tracemalloc.start()
+        t0 = time.perf_counter()
+        executar(args)
+        tempos.append((time.perf_counter() - t0) * 1000)
+        if memoria:
+            picos.append(tracemalloc.get_traced_memory()[1] / 2**20)
+            tracemalloc.stop()
+        chamadas, linhas = sum(banco.chamadas.values()), sum(banco.linhas.values())
+    return {"ms": round(statistics.median(tempos), 1), "pico_mb": round(max(picos), 1) if picos else None,
+            "chamadas": chamadas, "linhas": linhas}
+
+def executar_tamanho(n_testes, args):
+    banco = FakeSupabase(latencia=args.latencia_ms / 1000)
+    t0 = time.perf_counter()
+    popular(banco, n_testes, args.evidencias)
+    print(f"[{n_testes}] ciclo sintético gerado em {time.perf_counter() - t0:.1f}s "
+          f"({len(banco.tabelas['evidencias'])} evidências)", file=sys.stderr)
+    qa_dados._cliente, qa_dados._sessao = banco, SessaoEvidencias(banco)
+    limpar_cache()
+
+    rng = random.Random(7)
+    cenarios = {
+        "dashboard (cache frio)": cenario_dashboard(quente=False),
+        "dashboard (cache quente)": cenario_dashboard(quente=True),
+        "salvar critérios": cenario_salvar_grid("criterios", COLS_CRITERIOS, BUSCA_CRITERIOS, "CA", rng),
+        "salvar execução": cenario_salvar_grid("casos_teste", COLS_TESTES, BUSCA_TESTES, "CT", rng),
+        "salvar bugs": cenario_salvar_bugs(rng),
+        "gerar_pdf_completo": cenario_pdf(banco),
+    }
+    resultados = []
+    for nome, (preparar, executar) in cenarios.items():
+        if nome == "gerar_pdf_completo" and args.pdf_max and n_testes > args.pdf_max: continue
+        repeticoes = 1 if nome == "gerar_pdf_completo" else args.repeticoes  # minutos por execução em 50k
+        r = medir(banco, preparar, executar, repeticoes, not args.sem_memoria)
+        resultados.append({"casos": n_testes, "cenario": nome, **r})
+        print(f"[{n_testes}] {nome}: {r['ms']} ms", file=sys.stderr)
+    return resultados
+
+def comparar(atual, arquivo_base, tolerancia, minimo_ms=5.0):
+    """Compara as latências com um resultado salvo (--json). Retorna a lista de regressões."""
+    with open(arquivo_base, encoding="utf-8") as f:
+        base = pd.DataFrame(json.load(f))
+    df = atual.merge(base[["casos", "cenario", "ms"]], on=["casos", "cenario"], how="left", suffixes=("", "_base"))
+    df["variacao"] = (df["ms"] / df["ms_base"] - 1).round(3)
+    regressoes = df[(df["variacao"] > tolerancia) & (df["ms"] - df["ms_base"] > minimo_ms)]
+    print(df[["casos", "cenario", "ms_base", "ms", "variacao"]].to_string(index=False))
+    return regressoes
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark do QA Governance com Supabase em memória.")
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=[100, 1000, 10000, 50000], help="casos de teste por ciclo")
+    parser.add_argument("--evidencias", type=float, default=0.1, help="fração dos casos com evidência (padrão: 0.1)")
+    parser.add_argument("--repeticoes", type=int, default=3, help="repetições por cenário (PDF: 1); reporta a mediana")
+    parser.add_argument("--latencia-ms", type=float, default=0.0, help="latência simulada por chamada ao Supabase")
+    parser.add_argument("--pdf-max", type=int, default=None, help="não gera PDF acima deste número de casos")
+    parser.add_argument("--sem-memoria", action="store_true", help="desliga o tracemalloc (latência sem overhead)")
+    parser.add_argument("--json", help="grava os resultados neste arquivo")
+    parser.add_argument("--comparar", help="resultado anterior (--json) para detectar regressões")
+    parser.add_argument("--tolerancia", type=float, default=0.25, help="aumento de latência aceito (padrão: 0.25)")
+    args = parser.parse_args(argv)
+
+    resultados = pd.DataFrame([r for n in args.tamanhos for r in executar_tamanho(n, args)])
+    print(resultados.to_string(index=False))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultados.to_dict("records"), f, ensure_ascii=False, indent=1)
+    if args.comparar:
+        regressoes = comparar(resultados, args.comparar, args.tolerancia)
+        if not regressoes.empty:
+            print(f"{len(regressoes)} cenário(s) acima da tolerância de {args.tolerancia:.0%}.", file=sys.stderr)
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
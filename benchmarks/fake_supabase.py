@@ -0,0 +1,249 @@
+import re
+import time
+import itertools
+from collections import Counter, defaultdict
+from types import SimpleNamespace
+
+import pandas as pd
+
+# Substituto em memória do client Supabase (tabelas, RPCs de sql/ e Storage) para os benchmarks.
+# Cobre só o subconjunto da API usado em qa_dados; `latencia` (segundos) simula a ida e volta de cada chamada.
+
+def _dividir(texto):
+    # Separa por vírgulas de nível zero, respeitando parênteses e valores entre aspas
+    partes, atual, nivel, aspas, i = [], "", 0, False, 0
+    while i < len(texto):
+        c = texto[i]
+        if aspas and c == "\\":
+            atual += texto[i:i + 2]
+            i += 2
+            continue
+        if c == '"': aspas = not aspas
+        elif not aspas and c in "()": nivel += 1 if c == "(" else -1
+        elif not aspas and c == "," and nivel == 0:
+            partes.append(atual)
+            atual, i = "", i + 1
+            continue
+        atual += c
+        i += 1
+    return partes + [atual]
+
+def _valor(texto):
+    return re.sub(r"\\(.)", r"\1", texto[1:-1]) if len(texto) > 1 and texto[0] == texto[-1] == '"' else texto
+
+def _predicado(expr):
+    for logica, juntar in (("and(", all), ("or(", any)):
+        if expr.startswith(logica):
+            filhos = [_predicado(p) for p in _dividir(expr[len(logica):-1])]
+            return lambda r: juntar(f(r) for f in filhos)
+    coluna, op, valor = expr.split(".", 2)
+    if op == "is" and valor == "null": return lambda r: r.get(coluna) is None
+    if op == "in":
+        valores = {_valor(v) for v in _dividir(valor[1:-1])}
+        return lambda r: r.get(coluna) in valores
+    if op == "ilike":
+        termo = _valor(valor).strip("*").lower()
+        return lambda r: termo in str(r.get(coluna) or "").lower()
+    raise NotImplementedError(expr)
+
+class Consulta:
+    """Construtor de consulta no estilo postgrest: select/insert/upsert/update/delete + filtros."""
+    def __init__(self, banco, tabela):
+        self.banco, self.tabela = banco, tabela
+        self.operacao, self.payload, self.conflito = "select", None, ["id"]
+        self.colunas, self.contar, self.filtros = None, False, []
+        self.ordem, self.faixa, self.limite = None, None, None
+
+    def select(self, colunas="*", count=None):
+        self.colunas = None if colunas.strip() == "*" else [c.strip() for c in colunas.split(",")]
+        self.contar = count is not None
+        return self
+
+    def insert(self, payload):
+        self.operacao, self.payload = "insert", payload
+        return self
+
+    def upsert(self, payload, on_conflict="id"):
+        self.operacao, self.payload, self.conflito = "upsert", payload, on_conflict.split(",")
+        return self
+
+    def update(self, payload):
+        self.operacao, self.payload = "update", payload
+        return self
+
+    def delete(self):
+        self.operacao = "delete"
+        return self
+
+    def eq(self, coluna, valor):
+        self.filtros.append(lambda r: r.get(coluna) == valor)
+        return self
+
+    def in_(self, coluna, valores):
+        valores = set(valores)
+        self.filtros.append(lambda r: r.get(coluna) in valores)
+        return self
+
+    def or_(self, expressao):
+        # Árvore lógica do PostgREST, no subconjunto gerado por qa_dados.carregar_pagina: and(...)/or(...) aninhados
+        # com col.in.("a","b"), col.is.null e col.ilike."*termo*"
+        self.filtros.append(_predicado(f"or({expressao})"))
+        return self
+
+    def order(self, coluna, desc=False):
+        self.ordem = (coluna, desc)
+        return self
+
+    def range(self, inicio, fim):
+        self.faixa = (inicio, fim)
+        return self
+
+    def limit(self, n):
+        self.limite = n
+        return self
+
+    def execute(self):
+        self.banco.chamar(self.tabela, self.operacao)
+        linhas = self.banco.tabelas[self.tabela]
+        if self.operacao in ("insert", "upsert"):
+            registros = self.payload if isinstance(self.payload, list) else [self.payload]
+            return self._resposta(self.banco.gravar(self.tabela, registros, self.conflito if self.operacao == "upsert" else None))
+
+        selecionadas = [r for r in linhas if all(f(r) for f in self.filtros)]
+        if self.operacao == "delete":
+            ids = {id(r) for r in selecionadas}
+            self.banco.tabelas[self.tabela] = [r for r in linhas if id(r) not in ids]
+            return self._resposta(selecionadas)
+        if self.operacao == "update":
+            for r in selecionadas: r.update(self.payload)
+            return self._resposta(selecionadas)
+
+        total = len(selecionadas)
+        if self.ordem:
+            col, desc = self.ordem
+            selecionadas.sort(key=lambda r: (r.get(col) is None, r.get(col)), reverse=desc)
+        if self.faixa: selecionadas = selecionadas[self.faixa[0]:self.faixa[1] + 1]
+        if self.limite: selecionadas = selecionadas[:self.limite]
+        dados = [{c: r.get(c) for c in self.colunas} for r in selecionadas] if self.colunas else [dict(r) for r in selecionadas]
+        return self._resposta(dados, total if self.contar else None)
+
+    def _resposta(self, dados, count=None):
+        self.banco.linhas[self.tabela] += len(dados)
+        return SimpleNamespace(data=dados, count=count)
+
+class Bucket:
+    def __init__(self, banco, nome):
+        self.banco, self.nome = banco, nome
+
+    def upload(self, caminho, conteudo, opcoes=None):
+        self.banco.chamar(f"storage:{self.nome}", "upload")
+        self.banco.arquivos[f"{self.nome}/{caminho}"] = bytes(conteudo)
+
+    def get_public_url(self, caminho):
+        return f"{FakeSupabase.URL_STORAGE}/{self.nome}/{caminho}"
+
+class FakeSupabase:
+    """Client Supabase em memória. `chamadas` conta (tabela, operação) de cada execute/rpc/upload."""
+    URL_STORAGE = "http://supabase.local/storage/v1/object/public"
+
+    def __init__(self, latencia=0.0):
+        self.latencia = latencia
+        self.tabelas = defaultdict(list)
+        self.arquivos = {}
+        self.chamadas = Counter()
+        self.linhas = Counter()
+        self._ids = itertools.count(1)
+        self._contadores = {}
+
+    def chamar(self, alvo, operacao):
+        self.chamadas[(alvo, operacao)] += 1
+        if self.latencia: time.sleep(self.latencia)
+
+    def zerar_contagem(self):
+        self.chamadas.clear()
+        self.linhas.clear()
+
+    def gravar(self, tabela, registros, conflito=None):
+        linhas = self.tabelas[tabela]
+        indice = {tuple(r.get(c) for c in conflito): r for r in linhas} if conflito else {}
+        gravados = []
+        for reg in registros:
+            existente = indice.get(tuple(reg.get(c) for c in conflito)) if conflito else None
+            if existente is not None:
+                existente.update(reg)
+                gravados.append(existente)
+                continue
+            novo = {"id": next(self._ids), **reg}
+            linhas.append(novo)
+            if conflito: indice[tuple(novo.get(c) for c in conflito)] = novo
+            gravados.append(novo)
+        return gravados
+
+    def table(self, tabela):
+        return Consulta(self, tabela)
+
+    @property
+    def storage(self):
+        return SimpleNamespace(from_=lambda nome: Bucket(self, nome))
+
+    # --- RPCs (mesma semântica de sql/agregacoes.sql, sql/contadores.sql e sql/tendencias.sql) ---
+    def rpc(self, funcao, params):
+        def executar():
+            self.chamar(f"rpc:{funcao}", "rpc")
+            dados = getattr(self, f"_rpc_{funcao}")(**params)
+            return SimpleNamespace(data=dados, count=None)
+        return SimpleNamespace(execute=executar)
+
+    def _agrupar(self, tabela, exec_id, colunas, padroes):
+        linhas = [r for r in self.tabelas[tabela] if r.get("exec_id") == exec_id]
+        if not linhas: return []
+        df = pd.DataFrame(linhas).reindex(columns=colunas).fillna(padroes)
+        return df.groupby(colunas).size().reset_index(name="qtd").to_dict("records")
+
+    def _rpc_resumo_casos_teste(self, p_exec_id):
+        return self._agrupar("casos_teste", p_exec_id, ["funcionalidade", "status"],
+                             {"funcionalidade": "Sem módulo", "status": "Pendente"})
+
+    def _rpc_resumo_criterios(self, p_exec_id):
+        return self._agrupar("criterios", p_exec_id, ["funcionalidade", "status"],
+                             {"funcionalidade": "Sem módulo", "status": "Pendente"})
+
+    def _rpc_resumo_bugs(self, p_exec_id):
+        return self._agrupar("bugs", p_exec_id, ["prioridade", "status", "status_integracao"],
+                             {"prioridade": "Sem prioridade", "status": "Novo", "status_integracao": "Nao Integrado"})
+
+    def _rpc_reservar_ids(self, p_exec_id, p_prefixo, p_qtd, p_minimo=0):
+        chave = (p_exec_id, p_prefixo)
+        if chave not in self._contadores:
+            tabela, coluna = ("criterios", "crit_id") if p_prefixo == "CA" else ("casos_teste", "test_id")
+            numeros = [int(m.group(1)) for r in self.tabelas[tabela] if r.get("exec_id") == p_exec_id
+                       for m in [re.fullmatch(rf"{p_prefixo}-(\d+)", str(r.get(coluna)))] if m]
+            self._contadores[chave] = max(numeros, default=0)
+        self._contadores[chave] = max(self._contadores[chave], p_minimo) + p_qtd
+        return self._contadores[chave] - p_qtd + 1
+
+    def _rpc_atualizar_resumo_ciclo(self, p_exec_id):
+        def do_ciclo(tabela): return [r for r in self.tabelas[tabela] if r.get("exec_id") == p_exec_id]
+        testes, criterios, bugs = do_ciclo("casos_teste"), do_ciclo("criterios"), do_ciclo("bugs")
+        status = Counter(r.get("status") or "Pendente" for r in testes)
+        abertos = [b for b in bugs if (b.get("status") or "Novo") in ("Novo", "Em Correção")]
+        linha = {"exec_id": p_exec_id, "testes_total": len(testes), "testes_ok": status["OK"], "testes_falha": status["Falha"],
+                 "testes_bloqueado": status["Bloqueado"], "testes_pendente": status["Pendente"] + status["Em Execucao"],
+                 "testes_na": status["N/A"], "criterios_total": len(criterios),
+                 "criterios_ok": sum(1 for c in criterios if c.get("status") == "OK"), "bugs_total": len(bugs),
+                 "bugs_abertos": len(abertos), "bugs_criticos": sum(1 for b in abertos if b.get("prioridade") == "Critica"),
+                 "atualizado_em": time.strftime("%Y-%m-%dT%H:%M:%S")}
+        self.gravar("resumo_ciclos", [linha], ["exec_id"])
+
+class SessaoEvidencias:
+    """Substitui a sessão requests dos downloads de evidência, servindo os arquivos do FakeSupabase."""
+    def __init__(self, banco):
+        self.banco = banco
+
+    def get(self, url, timeout=None):
+        self.banco.chamar("storage:download", "get")
+        caminho = url.removeprefix(FakeSupabase.URL_STORAGE + "/")
+        conteudo = self.banco.arquivos.get(caminho)
+        def verificar():
+            if conteudo is None: raise FileNotFoundError(url)
+        return SimpleNamespace(content=conteudo or b"", status_code=200 if conteudo else 404, raise_for_status=verificar)
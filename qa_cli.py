@@ -0,0 +1,87 @@
+import os
+import re
+import sys
+import time
+import argparse
+import tempfile
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import qa_dados
+import qa_metricas
+from qa_relatorio import gerar_pdf_snapshot
+
+# Geração de relatórios sem interface: `python qa_cli.py --abertos` ou `python qa_cli.py --ids 12 15`.
+# Credenciais em SUPABASE_URL / SUPABASE_KEY. Cada ciclo roda num processo; o cache de evidências em disco é
+# compartilhado, então imagens repetidas entre ciclos são baixadas uma vez só. Por padrão o cache é um diretório
+# temporário desta execução; com --cache-evidencias ele persiste, com validade de QA_EVIDENCIAS_CACHE_TTL segundos.
+
+STATUS_ABERTOS = {"Pendente", "Em Execucao"}
+
+def _slug(texto):
+    return re.sub(r"[^A-Za-z0-9]+", "_", qa_dados._sem_acento(str(texto))).strip("_")[:40] or "ciclo"
+
+def _gerar(exec_id, titulo, saida, cache_evidencias, graficos):
+    # Roda no processo worker: carrega o ciclo, monta o PDF e grava em disco
+    t0 = time.perf_counter()
+    medicoes = qa_metricas.iniciar(f"ciclo {exec_id}")
+    snapshot = qa_dados.montar_snapshot(exec_id, titulo)
+    snapshot["graficos"] = graficos
+    t_dados = time.perf_counter() - t0
+    pdf, falhas = gerar_pdf_snapshot(snapshot, cache_evidencias=cache_evidencias)
+    arquivo = os.path.join(saida, f"QA_{exec_id}_{_slug(titulo)}.pdf")
+    with open(arquivo, "wb") as f: f.write(pdf)
+    return {"exec_id": exec_id, "arquivo": arquivo, "t_dados": t_dados, "t_pdf": time.perf_counter() - t0 - t_dados,
+            "testes": len(snapshot["df_testes"]), "evidencias": len(snapshot["evs_data"]), "falhas": len(falhas),
+            "metricas": medicoes.totais()}
+
+def selecionar_ciclos(ids=None, abertos=False):
+    """Ciclos a gerar: os `ids` pedidos, os abertos (com casos Pendente/Em Execucao) ou todos."""
+    ciclos = qa_dados.listar_execucoes()
+    if ids: ciclos = [c for c in ciclos if c['id'] in set(ids)]
+    if abertos:
+        ciclos = [c for c in ciclos if qa_dados.resumo_testes(c['id']).query("Status in @STATUS_ABERTOS")["qtd"].sum() > 0]
+    return ciclos
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera os relatórios PDF do QA Governance sem a interface.")
+    parser.add_argument("--ids", type=int, nargs="+", help="IDs dos ciclos (execucoes.id)")
+    parser.add_argument("--abertos", action="store_true", help="apenas ciclos com casos Pendente/Em Execucao")
+    parser.add_argument("--saida", default="relatorios", help="diretório dos PDFs (padrão: relatorios)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="processos em paralelo (padrão: nº de CPUs)")
+    parser.add_argument("--cache-evidencias",
+                        help="diretório persistente do cache de evidências (padrão: temporário, apagado ao final)")
+    parser.add_argument("--metricas", action="store_true", help="mostra os tempos por chamada/fase de cada ciclo")
+    parser.add_argument("--graficos", choices=["vetorial", "kaleido"], default=os.environ.get("QA_GRAFICOS_PDF", "vetorial"))
+    args = parser.parse_args(argv)
+
+    qa_dados.conectar()
+    ciclos = selecionar_ciclos(args.ids, args.abertos)
+    if not ciclos:
+        print("Nenhum ciclo encontrado.")
+        return 0
+    os.makedirs(args.saida, exist_ok=True)
+
+    t0, erros, workers = time.perf_counter(), 0, max(1, min(args.workers, len(ciclos)))
+    print(f"Gerando {len(ciclos)} relatório(s) com {workers} processo(s)...")
+    with tempfile.TemporaryDirectory(prefix="qa_evidencias_") as temporario, \
+         ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn")) as pool:
+        cache = args.cache_evidencias or temporario
+        futuros = {pool.submit(_gerar, c['id'], c['titulo'], args.saida, cache, args.graficos): c for c in ciclos}
+        for fut in as_completed(futuros):
+            c = futuros[fut]
+            try:
+                r = fut.result()
+            except Exception as e:
+                erros += 1
+                print(f"  [ERRO] {c['id']:>6} {c['titulo']}: {e}", file=sys.stderr)
+                continue
+            aviso = f" ({r['falhas']} evidência(s) indisponível(is))" if r['falhas'] else ""
+            print(f"  [OK]   {r['exec_id']:>6} {c['titulo']}: dados {r['t_dados']:.2f}s, pdf {r['t_pdf']:.2f}s, "
+                  f"{r['testes']} casos, {r['evidencias']} evidências -> {r['arquivo']}{aviso}")
+            if args.metricas: print(r['metricas'].to_string(index=False, float_format="%.1f"))
+    print(f"Concluído em {time.perf_counter() - t0:.2f}s: {len(ciclos) - erros} ok, {erros} com erro.")
+    return 1 if erros else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,806 @@
+import io
+import os
+import re
+import csv
+import json
+import time
+import hashlib
+import logging
+import threading
+import contextvars
+import unicodedata
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+import httpx
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from supabase import create_client, Client, ClientOptions
+from urllib3.util.retry import Retry
+
+import qa_metricas
+
+log = logging.getLogger("qa_governance")
+
+# Acesso a dados do QA Governance (Supabase): conexões, cache de consultas, leituras e gravações.
+# Não depende do Streamlit; usado pela interface (QaGovernance.py), pelos workers de relatório e pelo CLI.
+
+HTTP_POOL_MAX = int(os.environ.get("QA_HTTP_POOL_MAX", "20"))
+HTTP_RETRIES = int(os.environ.get("QA_HTTP_RETRIES", "3"))
+CACHE_TTL = int(os.environ.get("QA_CACHE_TTL", "300"))          # segundos
+CACHE_MAX_ENTRADAS = int(os.environ.get("QA_CACHE_MAX", "256"))
+CACHE_MAX_LINHAS = int(os.environ.get("QA_CACHE_MAX_LINHAS", "200000"))  # linhas somadas de todas as entradas
+CACHE_MAX_LINHAS_ENTRADA = int(os.environ.get("QA_CACHE_MAX_LINHAS_ENTRADA", "20000"))  # acima disso, não guarda
+
+STATUS_OPCOES = ["Pendente", "Em Execucao", "OK", "Falha", "Bloqueado", "N/A"]
+SEM_MODULO = "Sem módulo"  # funcionalidade NULL nos resumos (sql/agregacoes.sql); status NULL aparece como Pendente
+PRIORIDADE_OPCOES = ["Baixa", "Media", "Alta", "Critica"]
+STATUS_BUGS = ["Novo", "Em Correção", "Validado", "Cancelado"]
+
+# Mapeamento coluna do editor -> coluna do banco (a chave "ID" vira crit_id/test_id)
+COLS_CRITERIOS = {"ID": "crit_id", "Funcionalidade": "funcionalidade", "Descricao": "descricao", "Tipo": "tipo",
+                  "Prioridade": "prioridade", "Responsavel": "responsavel", "Status": "status"}
+COLS_TESTES = {"ID": "test_id", "Funcionalidade": "funcionalidade", "Titulo": "titulo", "Passos": "passos",
+               "Esperado": "esperado", "Status": "status", "Observacao": "observacao"}
+
+COLS_BUGS_EDITAVEIS = ["titulo", "descricao", "aplicacao", "ambiente", "prioridade", "status", "id_externo"]
+
+# Colunas pesquisadas pela busca textual de cada grid
+BUSCA_CRITERIOS = ["crit_id", "funcionalidade", "descricao", "responsavel"]
+BUSCA_TESTES = ["test_id", "funcionalidade", "titulo", "observacao"]
+
+LOTE_MAX = 500  # linhas por requisição de upsert/delete
+
+# Colunas de resumo_ciclos (sql/tendencias.sql)
+COLS_RESUMO_CICLO = ["exec_id", "testes_total", "testes_ok", "testes_falha", "testes_bloqueado", "testes_pendente",
+                     "testes_na", "criterios_total", "criterios_ok", "bugs_total", "bugs_abertos", "bugs_criticos",
+                     "atualizado_em"]
+
+# Upload de evidências: arquivos gravados por hash do conteúdo (bytes iguais = um objeto só no Storage)
+UPLOAD_WORKERS = int(os.environ.get("QA_UPLOAD_WORKERS", "8"))
+EVIDENCIA_LARGURA_MAX = int(os.environ.get("QA_EVIDENCIA_LARGURA_MAX", "1600"))  # px, na compressão opcional
+EVIDENCIA_QUALIDADE = int(os.environ.get("QA_EVIDENCIA_QUALIDADE", "85"))  # JPEG
+TIPOS_IMAGEM = {"png": "image/png", "jpg": "image/jpeg", "jpeg": "image/jpeg"}
+# URLs públicas por consulta in_("caminho", ...): vão na query string do GET, que os gateways limitam a poucos KB
+EVIDENCIA_LOTE_CONSULTA = int(os.environ.get("QA_EVIDENCIA_LOTE_CONSULTA", "50"))
+
+# Importação de planilhas: coluna do banco -> cabeçalhos aceitos (comparados sem acento e sem caixa)
+IMPORT_BLOCO = 5000  # linhas lidas do arquivo por vez
+IMPORT_MAX_ERROS = 10000  # linhas de erro guardadas no relatório (o total é sempre contado)
+IMPORT_COLUNAS = {
+    "casos_teste": {"test_id": ["id", "test_id", "caso de teste"], "funcionalidade": ["funcionalidade", "modulo"],
+                    "titulo": ["titulo"], "passos": ["passos"], "esperado": ["esperado", "resultado esperado"],
+                    "status": ["status"], "observacao": ["observacao", "obs"]},
+    "criterios": {"crit_id": ["id", "crit_id", "criterio"], "funcionalidade": ["funcionalidade", "modulo"],
+                  "descricao": ["descricao"], "tipo": ["tipo"], "prioridade": ["prioridade"],
+                  "responsavel": ["responsavel"], "status": ["status"]},
+    "bugs": {"titulo": ["titulo"], "descricao": ["descricao"], "aplicacao": ["aplicacao"], "ambiente": ["ambiente"],
+             "prioridade": ["prioridade"], "funcionalidade": ["funcionalidade", "modulo"], "status": ["status"],
+             "id_externo": ["id_externo", "id externo"]},
+}
+# Colunas sem as quais o arquivo é recusado inteiro (a chave de casos/critérios é opcional: há numeração automática)
+IMPORT_OBRIGATORIAS = {"casos_teste": ["titulo"], "criterios": ["descricao"], "bugs": ["titulo"]}
+
+# --- INSTRUMENTAÇÃO DAS CHAMADAS AO SUPABASE ---
+class _CorpoMedido(httpx.SyncByteStream):
+    # Conta os bytes do corpo e registra o evento quando o cliente termina de lê-lo
+    def __init__(self, corpo, ao_fechar):
+        self.corpo, self.ao_fechar, self.n = corpo, ao_fechar, 0
+
+    def __iter__(self):
+        for parte in self.corpo:
+            self.n += len(parte)
+            yield parte
+
+    def close(self):
+        self.corpo.close()
+        if self.ao_fechar: self.ao_fechar(self.n)
+        self.ao_fechar = None
+
+class TransporteMedido(httpx.BaseTransport):
+    """Envolve o transporte do client Supabase e registra cada requisição em qa_metricas:
+    tabela (ou rpc/bucket), filtro sem valores, linhas, bytes e latência até o fim da leitura do corpo."""
+    def __init__(self, base):
+        self.base = base
+
+    def handle_request(self, request):
+        t0 = time.perf_counter()
+        caminho = request.url.path
+        if "/storage/v1/" in caminho:
+            partes = caminho.split("/storage/v1/", 1)[1].split("/")  # object/<bucket>/<arquivo>
+            tipo, alvo = "storage", partes[1] if len(partes) > 1 else partes[0]
+        else:
+            tipo, alvo = "supabase", caminho.split("/rest/v1/", 1)[-1]
+        filtro = _filtro_sem_valores(request)
+        # Bytes enviados pelo cabeçalho: uploads do Storage são multipart em stream e não podem ser lidos aqui
+        enviados = int(request.headers.get("content-length") or 0)
+        detalhe = f"{request.method} {filtro}"[:300]
+        try:
+            resp = self.base.handle_request(request)
+        except Exception as e:
+            qa_metricas.registrar(tipo, alvo, (time.perf_counter() - t0) * 1000, detalhe=detalhe, erro=str(e))
+            raise
+
+        def ao_fechar(n_bytes):
+            qa_metricas.registrar(tipo, alvo, (time.perf_counter() - t0) * 1000, detalhe=detalhe,
+                                  linhas=_linhas(request, resp), bytes=n_bytes + enviados,
+                                  erro=None if resp.status_code < 400 else f"HTTP {resp.status_code}")
+        if resp.is_stream_consumed: ao_fechar(len(resp.content))  # corpo já em memória (transportes de teste)
+        else: resp.stream = _CorpoMedido(resp.stream, ao_fechar)
+        return resp
+
+    def close(self):
+        self.base.close()
+
+# Parâmetros estruturais do PostgREST (colunas, ordenação, paginação): não carregam dados do usuário
+_PARAMS_ESTRUTURAIS = {"order", "limit", "offset", "on_conflict", "columns"}
+
+def _filtro_sem_valores(request):
+    # Filtro registrado nas métricas: colunas e operadores, nunca os valores (ex.: a senha do login vira senha=eq.*)
+    if "/rpc/" in request.url.path:  # parâmetros da função, só os nomes
+        try: params = json.loads(_corpo_em_memoria(request) or b"{}")
+        except ValueError: params = {}
+        return ",".join(params) if isinstance(params, dict) else ""
+    partes = []
+    for k, v in request.url.params.multi_items():
+        if k == "select": continue
+        if k in _PARAMS_ESTRUTURAIS: partes.append(f"{k}={v}")
+        elif k in ("or", "and"): partes.append(f"{k}=" + ",".join(re.findall(r"(\w+\.\w+)\.", v)))
+        else: partes.append(f"{k}={v.split('.', 1)[0]}.*" if "." in v else f"{k}=*")
+    return "&".join(partes)
+
+def _corpo_em_memoria(request):
+    # Corpo JSON/bytes já carregado pelo httpx; b"" para corpos em stream (multipart), que só o transporte consome
+    return request.content if isinstance(request.stream, httpx.ByteStream) else b""
+
+def _linhas(request, resp):
+    # Leituras: Content-Range do PostgREST ("0-24/120" -> 25). Escritas: linhas do corpo enviado
+    faixa = re.match(r"(\d+)-(\d+)/", resp.headers.get("content-range", ""))
+    if faixa: return int(faixa.group(2)) - int(faixa.group(1)) + 1
+    if "/rpc/" not in request.url.path and request.method in ("POST", "PATCH") and request.headers.get("content-type", "").startswith("application/json"):
+        try:
+            corpo = json.loads(_corpo_em_memoria(request) or b"null")
+        except ValueError:
+            return None
+        return len(corpo) if isinstance(corpo, list) else 1 if isinstance(corpo, dict) else None
+    return 0 if resp.headers.get("content-range", "").startswith("*/") else None
+
+# --- CONEXÕES (uma por processo, compartilhadas entre reruns e sessões) ---
+_cliente = None
+_http = None
+_sessao = None
+_conexao_lock = threading.Lock()
+
+def conectar(url=None, key=None) -> Client:
+    """Cria (uma vez por processo) o client Supabase sobre um httpx.Client com pool limitado.
+    Sem argumentos, usa SUPABASE_URL/SUPABASE_KEY do ambiente."""
+    global _cliente, _http
+    with _conexao_lock:
+        if _cliente is None:
+            # Pool limitado e keep-alive para PostgREST/Storage; o transporte refaz conexões que falham
+            transporte = TransporteMedido(httpx.HTTPTransport(
+                retries=HTTP_RETRIES, http2=True,
+                limits=httpx.Limits(max_connections=HTTP_POOL_MAX, max_keepalive_connections=HTTP_POOL_MAX)))
+            _http = httpx.Client(transport=transporte, timeout=30, follow_redirects=True)
+            _cliente = create_client(url or os.environ["SUPABASE_URL"], key or os.environ["SUPABASE_KEY"],
+                                     options=ClientOptions(httpx_client=_http))
+        return _cliente
+
+def cliente() -> Client:
+    return _cliente or conectar()
+
+def criar_sessao_http():
+    # Sessão requests para baixar evidências: keep-alive, pool limitado e retry com backoff
+    retry = Retry(total=HTTP_RETRIES, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+                  allowed_methods=frozenset({"GET", "HEAD"}))
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_MAX, pool_block=True, max_retries=retry)
+    sessao = requests.Session()
+    sessao.mount("https://", adapter)
+    sessao.mount("http://", adapter)
+    return sessao
+
+def sessao_http():
+    """Sessão única por processo (UI, worker de relatório ou CLI)."""
+    global _sessao
+    with _conexao_lock:
+        if _sessao is None: _sessao = criar_sessao_http()
+        return _sessao
+
+def estatisticas_pool():
+    """Uso atual dos pools de conexão (requests e httpx), para dimensionar QA_HTTP_POOL_MAX."""
+    linhas = []
+    adapters = {id(a): a for a in sessao_http().adapters.values()}.values()
+    for adapter in adapters:
+        for chave in list(adapter.poolmanager.pools.keys()):
+            pool = adapter.poolmanager.pools.get(chave)
+            if pool is None: continue
+            livres = pool.pool.qsize() if pool.pool else 0
+            linhas.append({"cliente": "requests", "host": pool.host, "max": HTTP_POOL_MAX,
+                           "em_uso": HTTP_POOL_MAX - livres, "conexoes_criadas": pool.num_connections,
+                           "requisicoes": pool.num_requests})
+
+    pool_httpx = getattr(getattr(_http._transport, "base", None) if _http else None, "_pool", None)
+    conexoes = list(getattr(pool_httpx, "connections", []))
+    ociosas = sum(1 for c in conexoes if c.is_idle())
+    linhas.append({"cliente": "httpx (supabase)", "host": "*", "max": HTTP_POOL_MAX,
+                   "em_uso": len(conexoes) - ociosas, "conexoes_criadas": len(conexoes), "requisicoes": None})
+    return pd.DataFrame(linhas)
+
+# --- CACHE DE CONSULTAS ---
+def _linhas_resultado(valor):
+    # Tamanho estimado de um resultado em linhas: lista de registros ou (registros, total) da paginação
+    if isinstance(valor, tuple) and valor and isinstance(valor[0], list): valor = valor[0]
+    return len(valor) if isinstance(valor, list) else 1
+
+class CacheConsultas:
+    """Cache TTL + LRU de resultados de consulta, chaveado por (tabela, exec_id, escopo).
+    Limitado em entradas e em linhas somadas; resultados maiores que `max_linhas_entrada`
+    (ex.: o snapshot completo de um ciclo grande) não são guardados.
+    As escritas chamam invalidar() para as chaves afetadas."""
+    def __init__(self, ttl, max_entradas, max_linhas=CACHE_MAX_LINHAS, max_linhas_entrada=CACHE_MAX_LINHAS_ENTRADA):
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self.max_linhas = max_linhas
+        self.max_linhas_entrada = max_linhas_entrada
+        self._dados = OrderedDict()  # chave -> (instante, valor, linhas)
+        self._linhas = 0
+        self._lock = threading.Lock()
+        self._versao = 0  # evita regravar um resultado lido antes de uma invalidação
+
+    def obter(self, chave, carregar):
+        with self._lock:
+            item = self._dados.get(chave)
+            if item and time.monotonic() - item[0] < self.ttl:
+                self._dados.move_to_end(chave)
+                return item[1]
+            versao = self._versao
+
+        valor = carregar()
+        linhas = _linhas_resultado(valor)
+        with self._lock:
+            if versao == self._versao and linhas <= self.max_linhas_entrada:
+                self._remover(chave)
+                self._dados[chave] = (time.monotonic(), valor, linhas)
+                self._linhas += linhas
+                while len(self._dados) > self.max_entradas or self._linhas > self.max_linhas:
+                    self._remover(next(iter(self._dados)))
+        return valor
+
+    def _remover(self, chave):
+        item = self._dados.pop(chave, None)
+        if item: self._linhas -= item[2]
+
+    def invalidar(self, tabela, exec_id=None):
+        with self._lock:
+            self._versao += 1
+            for chave in [k for k in self._dados if k[0] == tabela and (exec_id is None or k[1] == exec_id)]:
+                self._remover(chave)
+
+_cache = CacheConsultas(CACHE_TTL, CACHE_MAX_ENTRADAS)
+
+def consultar(tabela, exec_id, escopo, carregar):
+    # Dados do ciclo são os mesmos para todos os usuários: escopo "ciclo"; execucoes usa o escopo do usuário
+    acerto = True
+    def carregar_contando():
+        nonlocal acerto
+        acerto = False
+        return carregar()
+    valor = _cache.obter((tabela, exec_id, escopo), carregar_contando)
+    if acerto: qa_metricas.registrar("cache", tabela, 0, detalhe=f"exec_id={exec_id} {escopo}", nivel=logging.DEBUG)
+    return valor
+
+def invalidar(tabela, exec_id=None):
+    _cache.invalidar(tabela, exec_id)
+
+@contextmanager
+def gravando(tabela, exec_id=None, resumo=False):
+    """Envolve uma escrita: invalida o cache (e atualiza o resumo do ciclo) mesmo se um lote falhar no meio."""
+    try:
+        yield
+    finally:
+        invalidar(tabela, exec_id)
+        if resumo: atualizar_resumo_ciclo(exec_id)
+
+# --- USUÁRIOS E CICLOS ---
+def autenticar(email, senha):
+    u = cliente().table("usuarios").select("*").eq("email", email).eq("senha", senha).execute()
+    return u.data[0] if u.data else None
+
+def listar_execucoes(user=None):
+    """Ciclos visíveis ao usuário (todos quando `user` é None ou pode_ver_todos)."""
+    todos = user is None or user['pode_ver_todos']
+    def carregar():
+        q = cliente().table("execucoes").select("*")
+        if not todos: q = q.eq("user_id", user['id'])
+        return q.execute().data
+    return consultar("execucoes", None, "todos" if todos else user['id'], carregar)
+
+def criar_execucao(user, titulo):
+    with gravando("execucoes"):
+        cliente().table("execucoes").insert({"user_id": user['id'], "titulo": titulo, "data": datetime.now().strftime("%Y-%m-%d")}).execute()
+
+# --- CRITÉRIOS, CASOS DE TESTE E BUGS ---
+def reservar_ids(prefix, exec_id, qtd, minimo=0):
+    """Reserva atomicamente um bloco contíguo de `qtd` IDs CA-/CT- no ciclo (sql/contadores.sql).
+    `minimo` garante que o bloco comece acima de IDs explícitos já gravados."""
+    inicio = cliente().rpc("reservar_ids", {"p_exec_id": exec_id, "p_prefixo": prefix, "p_qtd": qtd, "p_minimo": minimo}).execute().data
+    return [f"{prefix}-{str(n).zfill(3)}" for n in range(inicio, inicio + qtd)]
+
+def _maior_id(serie, prefix):
+    # Maior número N entre os valores "<prefix>-N" da série (0 se nenhum)
+    nums = pd.to_numeric(serie.astype("string").str.strip().str.extract(rf"^{prefix}-(\d+)$")[0], errors="coerce")
+    return int(nums.max()) if nums.notna().any() else 0
+
+def _normalizar(df):
+    # NaN/NaT -> None, para serializar em JSON e comparar sem falsos positivos
+    return df.astype(object).where(pd.notna(df), None)
+
+def _lotes(itens, tamanho=LOTE_MAX):
+    for i in range(0, len(itens), tamanho):
+        yield itens[i:i + tamanho]
+
+def diff_editor(df_orig, df_ed, chave="ID"):
+    """Compara o resultado do data_editor com o DataFrame carregado.
+    Retorna (linhas novas ou alteradas, lista de chaves removidas)."""
+    orig = _normalizar(df_orig).drop_duplicates(chave, keep="last").set_index(chave)
+    ed = _normalizar(df_ed).drop_duplicates(chave, keep="last").set_index(chave)
+    cols = ed.columns
+
+    removidos = orig.index.difference(ed.index).tolist()
+    novos = ed.index.difference(orig.index)
+    comuns = ed.index.intersection(orig.index)
+    a = ed.loc[comuns, cols].fillna("").astype(str)
+    b = orig.loc[comuns].reindex(columns=cols).fillna("").astype(str)
+    difere = (a != b).any(axis=1)
+    alterados = comuns[difere.to_numpy()]
+
+    return ed.loc[novos.append(alterados)].reset_index(), removidos
+
+class IdEmUso(ValueError):
+    """IDs digitados na grade que já existem no ciclo, fora da página editada. Nada é gravado."""
+
+def salvar_diff(tabela, exec_id, col_map, prefix, df_orig, df_ed):
+    """Grava apenas as linhas inseridas, alteradas e removidas, em lotes de upsert/delete
+    pela chave (exec_id, crit_id/test_id). Retorna (qtd gravada, qtd removida).
+    `df_orig` é só a página visível: IDs novos digitados que já existem em outra página
+    levantam IdEmUso, em vez de o upsert sobrescrever a linha gravada."""
+    chave_db = col_map["ID"]
+    df_ed = df_ed.copy()
+
+    sem_id = df_ed["ID"].isna() | (df_ed["ID"].astype(str).str.strip() == "")
+    novos = df_ed.loc[~sem_id & ~df_ed["ID"].isin(df_orig["ID"]), "ID"]
+    em_uso = []
+    for lote in _lotes(novos.astype(str).unique().tolist()):
+        em_uso += [r[chave_db] for r in cliente().table(tabela).select(chave_db)
+                   .eq("exec_id", exec_id).in_(chave_db, lote).execute().data]
+    if em_uso: raise IdEmUso("ID(s) já usado(s) em outra página do ciclo: " + ", ".join(sorted(em_uso)))
+
+    # Linhas novas do editor sem ID recebem um bloco de IDs reservado no ciclo, acima dos IDs digitados na grade.
+    # Com IDs novos digitados a reserva roda mesmo sem linhas a numerar (qtd 0), para o contador passar deles.
+    maior = _maior_id(novos, prefix)
+    if sem_id.any() or maior:
+        df_ed.loc[sem_id, "ID"] = reservar_ids(prefix, exec_id, int(sem_id.sum()), maior)
+
+    alterados, removidos = diff_editor(df_orig, df_ed)
+
+    regs = alterados.reindex(columns=list(col_map)).rename(columns=col_map)
+    regs["status"] = regs["status"].where(regs["status"].notna(), "Pendente")
+    regs["exec_id"] = exec_id
+    registros = regs.to_dict("records")
+
+    with gravando(tabela, exec_id, resumo=bool(registros or removidos)):
+        for lote in _lotes(registros):
+            cliente().table(tabela).upsert(lote, on_conflict=f"exec_id,{chave_db}").execute()
+        for lote in _lotes(removidos):
+            cliente().table(tabela).delete().eq("exec_id", exec_id).in_(chave_db, lote).execute()
+
+    return len(registros), len(removidos)
+
+def criar_em_lote(tabela, col_map, prefix, exec_id, qtd, funcionalidade=None):
+    """Cria `qtd` linhas pendentes com IDs reservados em bloco, num único insert por lote."""
+    ids = reservar_ids(prefix, exec_id, qtd)
+    registros = [{"exec_id": exec_id, col_map["ID"]: i, "funcionalidade": funcionalidade or None, "status": "Pendente"} for i in ids]
+    with gravando(tabela, exec_id, resumo=True):
+        for lote in _lotes(registros):
+            cliente().table(tabela).insert(lote).execute()
+    return ids
+
+def _status_integracao(id_externo):
+    # Lógica de Integração Automática: tem ID externo preenchido -> Integrado
+    integrado = id_externo.fillna("").astype(str).str.strip() != ""
+    return integrado.map({True: "Integrado", False: "Nao Integrado"})
+
+def salvar_bugs(exec_id, df_orig, df_ed):
+    """Grava em upsert único (pela coluna id) apenas os bugs com alguma célula alterada.
+    Retorna a quantidade de bugs gravados."""
+    cols = ["id"] + COLS_BUGS_EDITAVEIS
+    alterados, _ = diff_editor(df_orig.reindex(columns=cols), df_ed.reindex(columns=cols), chave="id")
+    if alterados.empty: return 0
+
+    alterados["status_integracao"] = _status_integracao(alterados["id_externo"])
+    alterados["exec_id"] = exec_id
+    registros = alterados.to_dict("records")
+
+    with gravando("bugs", exec_id, resumo=True):
+        for lote in _lotes(registros):
+            cliente().table("bugs").upsert(lote, on_conflict="id").execute()
+    return len(registros)
+
+class ArquivoInvalido(ValueError):
+    """Planilha recusada antes de gravar qualquer linha (vazia ou sem as colunas do schema)."""
+
+def _sem_acento(texto):
+    texto = unicodedata.normalize("NFKD", str(texto)).encode("ascii", "ignore").decode()
+    return " ".join(texto.lower().replace("_", " ").split())
+
+def ler_em_blocos(arquivo, nome, tamanho=IMPORT_BLOCO):
+    """Lê CSV (separador detectado) ou XLSX em blocos de `tamanho` linhas, tudo como texto."""
+    if nome.lower().endswith(".xlsx"):
+        from openpyxl import load_workbook
+        ws = load_workbook(arquivo, read_only=True, data_only=True).active
+        linhas = ws.iter_rows(values_only=True)
+        cabecalho = [str(c) if c is not None else "" for c in next(linhas, [])]
+        if not any(cabecalho): raise ArquivoInvalido("Arquivo vazio ou sem cabeçalho.")
+        bloco = []
+        for linha in linhas:
+            bloco.append(linha)
+            if len(bloco) == tamanho:
+                yield pd.DataFrame(bloco, columns=cabecalho, dtype=object)
+                bloco = []
+        if bloco: yield pd.DataFrame(bloco, columns=cabecalho, dtype=object)
+        return
+
+    amostra = arquivo.read(64 * 1024).decode("utf-8-sig", errors="replace")
+    arquivo.seek(0)
+    try: sep = csv.Sniffer().sniff(amostra, delimiters=",;\t|").delimiter
+    except csv.Error: sep = ","
+    try:
+        yield from pd.read_csv(arquivo, sep=sep, chunksize=tamanho, dtype=str, keep_default_na=False,
+                               encoding="utf-8-sig", encoding_errors="replace")
+    except pd.errors.EmptyDataError:
+        raise ArquivoInvalido("Arquivo vazio ou sem cabeçalho.") from None
+
+def _validar_bloco(bloco, tabela):
+    """Mapeia cabeçalhos para o schema e valida status/prioridade de forma vetorizada.
+    Só as colunas presentes no arquivo vão para o banco: o upsert não apaga campos que a planilha não traz.
+    Retorna (linhas válidas já no formato do banco, Series de erro indexada pela linha)."""
+    aceitos = {_sem_acento(a): col for col, aliases in IMPORT_COLUNAS[tabela].items() for a in aliases}
+    mapa = {}
+    for c in bloco.columns:
+        col = aceitos.get(_sem_acento(c))
+        if col and col not in mapa.values(): mapa[c] = col
+    if not mapa:
+        raise ArquivoInvalido("Nenhuma coluna reconhecida. Use: " + ", ".join(a[0] for a in IMPORT_COLUNAS[tabela].values()))
+    faltando = [c for c in IMPORT_OBRIGATORIAS[tabela] if c not in mapa.values()]
+    if faltando: raise ArquivoInvalido("Coluna obrigatória ausente: " + ", ".join(faltando))
+    colunas = list(mapa.values())
+    chave = next(iter(IMPORT_COLUNAS[tabela]))
+    if tabela != "bugs" and chave not in colunas: colunas.insert(0, chave)  # preenchida pela numeração automática
+    df = bloco[list(mapa)].rename(columns=mapa).reindex(columns=colunas)
+    df = df.astype("string").apply(lambda col: col.str.strip())
+    df = df.mask(df.eq("").fillna(False)).astype(object)
+    df = df.where(df.notna(), None)
+
+    erros = pd.Series(None, index=df.index, dtype=object)
+    if tabela == "bugs":
+        if "status" in df:
+            df["status"] = df["status"].fillna("Novo")
+            erros[~df["status"].isin(STATUS_BUGS)] = "Status inválido (use: " + ", ".join(STATUS_BUGS) + ")"
+        erros[df["titulo"].isna()] = "Título obrigatório"
+        if "id_externo" in df:
+            duplicado = df["id_externo"].notna() & df.duplicated("id_externo", keep="last")
+            erros[duplicado] = "ID externo repetido no arquivo (mantida a última ocorrência)"
+    else:
+        if "status" in df:
+            df["status"] = df["status"].fillna("Pendente")
+            erros[~df["status"].isin(STATUS_OPCOES)] = "Status inválido (use: " + ", ".join(STATUS_OPCOES) + ")"
+        duplicado = df[chave].notna() & df.duplicated(chave, keep="last")
+        erros[duplicado] = "ID repetido no arquivo (mantida a última ocorrência)"
+    if "prioridade" in df:
+        erros[df["prioridade"].notna() & ~df["prioridade"].isin(PRIORIDADE_OPCOES)] = \
+            "Prioridade inválida (use: " + ", ".join(PRIORIDADE_OPCOES) + ")"
+
+    return df[erros.isna()], erros.dropna()
+
+def _maior_id_no_arquivo(arquivo, nome, tabela, prefix):
+    # Passada prévia (em blocos) pelo maior "<prefix>-NNN" explícito do arquivo
+    aceitos = {_sem_acento(a) for a in IMPORT_COLUNAS[tabela][next(iter(IMPORT_COLUNAS[tabela]))]}
+    maior = 0
+    for bloco in ler_em_blocos(arquivo, nome):
+        for col in [c for c in bloco.columns if _sem_acento(c) in aceitos][:1]:
+            maior = max(maior, _maior_id(bloco[col], prefix))
+    arquivo.seek(0)
+    return maior
+
+def _separar_bugs_importados(lote, exec_id):
+    # Bugs cujo id_externo já está no ciclo viram atualização pelo `id`: reimportar a planilha não duplica.
+    # Sem id_externo não há como reconhecer a linha, e ela é sempre inserida. Retorna (novos, existentes).
+    registros = lote.to_dict("records")
+    externos = list(dict.fromkeys(r["id_externo"] for r in registros if r.get("id_externo")))
+    ids = {}
+    if externos:
+        dados = cliente().table("bugs").select("id, id_externo").eq("exec_id", exec_id).in_("id_externo", externos).execute().data
+        ids = {d["id_externo"]: d["id"] for d in dados}
+    novos, existentes = [], []
+    for r in registros:
+        if r.get("id_externo") in ids: existentes.append({"id": ids[r["id_externo"]], **r})
+        else: novos.append(r if "status" in r else {**r, "status": "Novo"})  # status só preenchido em bug novo
+    return novos, existentes
+
+def importar_arquivo(arquivo, nome, tabela, exec_id, progresso=None):
+    """Importa uma planilha para casos_teste/criterios/bugs lendo em blocos e gravando em lotes
+    de LOTE_MAX. Retorna (linhas gravadas, DataFrame de erros por linha, total de erros).
+    Levanta ArquivoInvalido se o arquivo estiver vazio ou sem as colunas obrigatórias."""
+    prefix = {"casos_teste": "CT", "criterios": "CA"}.get(tabela)
+    chave = next(iter(IMPORT_COLUNAS[tabela]))
+    gravadas, total_erros, lidas, relatorio = 0, 0, 0, []
+    # IDs explícitos do arquivo elevam o contador, para a numeração automática não colidir com eles
+    maior_id = _maior_id_no_arquivo(arquivo, nome, tabela, prefix) if prefix else 0
+
+    def registrar(linhas, motivos):
+        nonlocal total_erros
+        total_erros += len(linhas)
+        espaco = IMPORT_MAX_ERROS - sum(len(r) for r in relatorio)
+        if espaco > 0: relatorio.append(pd.DataFrame({"linha": linhas, "erro": motivos}).head(espaco))
+
+    try:
+        for bloco in ler_em_blocos(arquivo, nome):
+            bloco.index = range(lidas + 2, lidas + 2 + len(bloco))  # número da linha no arquivo (cabeçalho = 1)
+            lidas += len(bloco)
+            validas, erros = _validar_bloco(bloco, tabela)
+            if len(erros): registrar(erros.index.tolist(), erros.tolist())
+
+            validas = validas.copy()
+            validas["exec_id"] = exec_id
+            if tabela == "bugs":
+                id_externo = validas["id_externo"] if "id_externo" in validas else pd.Series(None, index=validas.index, dtype=object)
+                validas["status_integracao"] = _status_integracao(id_externo)
+            else:
+                sem_id = validas[chave].isna()
+                if sem_id.any(): validas.loc[sem_id, chave] = reservar_ids(prefix, exec_id, int(sem_id.sum()), maior_id)
+
+            for ini in range(0, len(validas), LOTE_MAX):
+                lote = validas.iloc[ini:ini + LOTE_MAX]
+                try:
+                    if tabela == "bugs":
+                        novos, existentes = _separar_bugs_importados(lote, exec_id)
+                        if existentes: cliente().table(tabela).upsert(existentes, on_conflict="id").execute()
+                        if novos: cliente().table(tabela).insert(novos).execute()
+                    else: cliente().table(tabela).upsert(lote.to_dict("records"), on_conflict=f"exec_id,{chave}").execute()
+                    gravadas += len(lote)
+                except Exception as e:
+                    registrar(lote.index.tolist(), [f"Falha ao gravar o lote: {e}"] * len(lote))
+            if progresso: progresso(lidas, gravadas)
+    finally:
+        invalidar(tabela, exec_id)
+        if gravadas: atualizar_resumo_ciclo(exec_id)
+    erros = pd.concat(relatorio, ignore_index=True) if relatorio else pd.DataFrame(columns=["linha", "erro"])
+    return gravadas, erros, total_erros
+
+def _df_do_banco(dados, col_map):
+    # Linhas do banco -> DataFrame com as colunas do editor (ID, Funcionalidade, ...)
+    return pd.DataFrame(dados, columns=list(col_map.values())).rename(columns={v: k for k, v in col_map.items()})
+
+def carregar_tabela(tabela, exec_id, col_map):
+    """Todas as linhas do ciclo (usado no snapshot do relatório)."""
+    dados = consultar(tabela, exec_id, "ciclo",
+                      lambda: cliente().table(tabela).select(", ".join(col_map.values())).eq("exec_id", exec_id).order("id").execute().data)
+    return _df_do_banco(dados, col_map)
+
+def _citar(valor):
+    # Escapa um valor para aparecer entre aspas numa árvore lógica do PostgREST
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"')
+
+def _em_ou_nulo(coluna, valores):
+    # "coluna in valores ou NULL" como condições de um or=(...)
+    condicoes = [f"{coluna}.in.(" + ",".join(f'"{_citar(v)}"' for v in valores) + ")"] if valores else []
+    return ",".join(condicoes + [f"{coluna}.is.null"])
+
+def carregar_pagina(tabela, exec_id, col_map, campos_busca, pagina, tamanho, funcionalidades=(), status=(), busca=""):
+    """Busca só a página visível do grid, com filtros e busca aplicados no banco.
+    Retorna (DataFrame da página, total de linhas que atendem aos filtros)."""
+    def carregar():
+        q = cliente().table(tabela).select(", ".join(col_map.values()), count="exact").eq("exec_id", exec_id)
+        # Escolhas que os resumos mostram para NULL ("Sem módulo", "Pendente") viram `is.null`, que o in_ não alcança;
+        # com mais de uma condição "ou" na consulta, elas vão juntas num único or=(and(or(...),or(...)))
+        grupos = []
+        for coluna, escolhas, rotulo_nulo in (("funcionalidade", funcionalidades, SEM_MODULO), ("status", status, "Pendente")):
+            if not escolhas: continue
+            if rotulo_nulo not in escolhas: q = q.in_(coluna, list(escolhas))
+            else: grupos.append(_em_ou_nulo(coluna, [e for e in escolhas if e != rotulo_nulo]))
+        if busca:
+            termo = _citar(busca)
+            grupos.append(",".join(f'{c}.ilike."*{termo}*"' for c in campos_busca))
+        if len(grupos) == 1: q = q.or_(grupos[0])
+        elif grupos: q = q.or_("and(" + ",".join(f"or({g})" for g in grupos) + ")")
+        res = q.order("id").range((pagina - 1) * tamanho, pagina * tamanho - 1).execute()
+        return res.data, res.count or 0
+
+    escopo = ("pagina", pagina, tamanho, tuple(funcionalidades), tuple(status), busca)
+    dados, total = consultar(tabela, exec_id, escopo, carregar)
+    return _df_do_banco(dados, col_map), total
+
+def listar_ids_testes(exec_id):
+    return [r["test_id"] for r in consultar("casos_teste", exec_id, "ids",
+            lambda: cliente().table("casos_teste").select("test_id").eq("exec_id", exec_id).order("id").execute().data)]
+
+def resumo_criterios(exec_id):
+    """Contagens (Funcionalidade, Status, qtd) dos critérios do ciclo, agregadas no banco."""
+    dados = consultar("criterios", exec_id, "resumo",
+                      lambda: cliente().rpc("resumo_criterios", {"p_exec_id": exec_id}).execute().data)
+    return pd.DataFrame(dados, columns=["funcionalidade", "status", "qtd"]).rename(
+        columns={"funcionalidade": "Funcionalidade", "status": "Status"})
+
+def resumo_testes(exec_id):
+    """Contagens (Funcionalidade, Status, qtd) do ciclo, agregadas no banco (sql/agregacoes.sql)."""
+    dados = consultar("casos_teste", exec_id, "resumo",
+                      lambda: cliente().rpc("resumo_casos_teste", {"p_exec_id": exec_id}).execute().data)
+    return pd.DataFrame(dados, columns=["funcionalidade", "status", "qtd"]).rename(
+        columns={"funcionalidade": "Funcionalidade", "status": "Status"})
+
+def resumo_bugs(exec_id):
+    """Contagens (prioridade, status, status_integracao, qtd) dos bugs do ciclo, agregadas no banco."""
+    dados = consultar("bugs", exec_id, "resumo", lambda: cliente().rpc("resumo_bugs", {"p_exec_id": exec_id}).execute().data)
+    return pd.DataFrame(dados, columns=["prioridade", "status", "status_integracao", "qtd"])
+
+def carregar_bugs(exec_id):
+    dados = consultar("bugs", exec_id, "ciclo", lambda: cliente().table("bugs").select("*").eq("exec_id", exec_id).execute().data)
+    return pd.DataFrame(dados) if dados else pd.DataFrame(columns=['id', 'titulo', 'descricao', 'aplicacao', 'ambiente', 'prioridade', 'funcionalidade', 'status', 'id_externo', 'status_integracao'])
+
+def registrar_bug(exec_id, bug):
+    with gravando("bugs", exec_id, resumo=True):
+        cliente().table("bugs").insert({"exec_id": exec_id, "status": "Novo", **bug}).execute()
+
+# --- TENDÊNCIAS ENTRE CICLOS ---
+def atualizar_resumo_ciclo(exec_id):
+    """Recalcula a linha do ciclo em `resumo_ciclos` (sql/tendencias.sql). Chamado após cada gravação;
+    uma falha aqui não desfaz o salvamento, só deixa o resumo com o `atualizado_em` anterior."""
+    try:
+        cliente().rpc("atualizar_resumo_ciclo", {"p_exec_id": exec_id}).execute()
+    except Exception as e:
+        log.warning("Resumo do ciclo %s não atualizado: %s", exec_id, e)
+    invalidar("resumo_ciclos")
+
+def carregar_tendencias(user=None):
+    """Uma linha de contagens por ciclo visível ao usuário, com título/data do ciclo e taxas derivadas."""
+    execs = pd.DataFrame(listar_execucoes(user), columns=["id", "titulo", "data"])
+    if execs.empty: return pd.DataFrame()
+    ids = execs["id"].tolist()
+    todos = user is None or user['pode_ver_todos']
+    def carregar():
+        if todos: return cliente().table("resumo_ciclos").select("*").execute().data
+        return [r for lote in _lotes(ids) for r in cliente().table("resumo_ciclos").select("*").in_("exec_id", lote).execute().data]
+    dados = consultar("resumo_ciclos", None, "todos" if todos else user['id'], carregar)
+
+    # Ciclos ainda sem linha no resumo (recém-criados) entram zerados
+    df = execs.rename(columns={"id": "exec_id"}).merge(pd.DataFrame(dados, columns=COLS_RESUMO_CICLO), on="exec_id", how="left")
+    contagens = COLS_RESUMO_CICLO[1:-1]
+    df[contagens] = df[contagens].fillna(0).astype(int)
+    validos = (df["testes_total"] - df["testes_na"]).where(lambda v: v > 0)
+    df["taxa_aprovacao"] = (df["testes_ok"] / validos * 100).round(1)
+    df["progresso"] = ((validos - df["testes_pendente"]) / validos * 100).round(1)
+    return df.sort_values(["data", "exec_id"], ignore_index=True)
+
+# --- EVIDÊNCIAS ---
+def listar_evidencias(exec_id):
+    return consultar("evidencias", exec_id, "ciclo",
+                     lambda: cliente().table("evidencias").select("caminho, test_id").eq("exec_id", exec_id).execute().data)
+
+def comprimir_imagem(conteudo, largura_max=EVIDENCIA_LARGURA_MAX, qualidade=EVIDENCIA_QUALIDADE):
+    """Reduz a imagem a `largura_max` px e regrava em JPEG (PNG otimizado se houver transparência).
+    Retorna (bytes, extensão), ou None quando a versão comprimida não fica menor que o original."""
+    from PIL import Image  # vem com o fpdf2
+    img = Image.open(io.BytesIO(conteudo))
+    img.load()
+    if img.format == "JPEG" and img.width <= largura_max: return None  # recomprimir só perderia qualidade
+    if img.width > largura_max:
+        img = img.resize((largura_max, max(1, round(img.height * largura_max / img.width))), Image.LANCZOS)
+    buf = io.BytesIO()
+    if img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info):
+        img.save(buf, format="PNG", optimize=True)
+        ext = "png"
+    else:
+        img.convert("RGB").save(buf, format="JPEG", quality=qualidade, optimize=True)
+        ext = "jpg"
+    return (buf.getvalue(), ext) if buf.tell() < len(conteudo) else None
+
+def ids_no_nome(nome_arquivo, ids_testes):
+    """Casos de teste citados no nome do arquivo (ex.: "CT-012_login.png", "ct12 e ct13.png")."""
+    numeros = {int(n) for n in re.findall(r"CT[-_ ]?(\d+)", nome_arquivo, re.IGNORECASE)}
+    return [i for i in ids_testes if str(i).startswith("CT-") and str(i)[3:].isdigit() and int(str(i)[3:]) in numeros]
+
+def anexar_evidencias(exec_id, arquivos, comprimir=False, max_workers=UPLOAD_WORKERS):
+    """Vincula imagens a casos de teste. `arquivos` é uma lista de (nome, bytes, [test_ids]).
+    Cada conteúdo vai para o Storage uma única vez, em `conteudo/<h[:2]>/<h>.<ext>` no bucket
+    `evidencias`: h é o sha256 hex dos bytes após a compressão opcional, e os 2 primeiros
+    caracteres formam um subdiretório. Uploads rodam em paralelo e os vínculos saem num insert
+    em lote em `evidencias`, sem repetir vínculos que o ciclo já tem. Retorna (vínculos criados,
+    arquivos enviados, arquivos já existentes no Storage, [(arquivo, motivo da falha)])."""
+    bucket = cliente().storage.from_("evidencias")
+    falhas = []
+
+    def preparar(nome, conteudo):
+        ext = nome.rsplit(".", 1)[-1].lower() if "." in nome else ""
+        if comprimir:
+            with qa_metricas.medir("evidencia", "compressao", detalhe=nome, bytes=len(conteudo)):
+                menor = comprimir_imagem(conteudo)
+            if menor: conteudo, ext = menor
+        if ext not in TIPOS_IMAGEM: raise ValueError(f"tipo de arquivo não suportado: {nome}")
+        return hashlib.sha256(conteudo).hexdigest(), ext, conteudo
+
+    # 1. Compressão e hash em paralelo; arquivos com o mesmo conteúdo colapsam num único objeto
+    objetos, vinculos = {}, []  # caminho -> (ext, bytes, nome); (test_id, caminho)
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(arquivos)))) as pool:
+        futuros = {pool.submit(contextvars.copy_context().run, preparar, nome, conteudo): (nome, test_ids)
+                   for nome, conteudo, test_ids in arquivos}
+        for fut in as_completed(futuros):
+            nome, test_ids = futuros[fut]
+            try:
+                h, ext, conteudo = fut.result()
+            except Exception as e:
+                falhas.append((nome, str(e)))
+                continue
+            if not test_ids:
+                falhas.append((nome, "nenhum caso de teste associado"))
+                continue
+            caminho = f"conteudo/{h[:2]}/{h}.{ext}"
+            objetos[caminho] = (ext, conteudo, nome)
+            vinculos.extend((t, caminho) for t in test_ids)
+    if not objetos: return 0, 0, 0, falhas
+
+    # 2. Objetos já referenciados em `evidencias` (qualquer ciclo) não são reenviados
+    urls = {caminho: bucket.get_public_url(caminho) for caminho in objetos}
+    existentes = []
+    try:
+        for lote in _lotes(list(urls.values()), EVIDENCIA_LOTE_CONSULTA):
+            existentes += cliente().table("evidencias").select("exec_id, test_id, caminho").in_("caminho", lote).execute().data
+    except Exception as e:
+        log.warning("Falha ao consultar evidências existentes do ciclo %s: %s", exec_id, e)
+        return 0, 0, 0, falhas + [(nome, f"falha ao consultar evidências existentes: {e}") for _, _, nome in objetos.values()]
+    no_storage = {e["caminho"] for e in existentes}
+    ja_vinculados = {(e["test_id"], e["caminho"]) for e in existentes if e["exec_id"] == exec_id}
+
+    def enviar(caminho):
+        ext, conteudo, _ = objetos[caminho]
+        bucket.upload(caminho, conteudo, {"content-type": TIPOS_IMAGEM[ext], "cache-control": "31536000", "upsert": "true"})
+
+    # 3. Uploads concorrentes; vínculos de objetos que falharam são descartados
+    pendentes = [c for c in objetos if urls[c] not in no_storage]
+    enviados = set()
+    if pendentes:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(pendentes))) as pool:
+            futuros = {pool.submit(contextvars.copy_context().run, enviar, c): c for c in pendentes}
+            for fut in as_completed(futuros):
+                try:
+                    fut.result()
+                    enviados.add(futuros[fut])
+                except Exception as e:
+                    falhas.append((objetos[futuros[fut]][2], str(e)))
+
+    # 4. Um insert em lote com os vínculos novos
+    hoje = datetime.now().strftime("%Y-%m-%d")
+    ok = {c for c in objetos if c in enviados or urls[c] in no_storage}
+    registros = [{"exec_id": exec_id, "test_id": t, "caminho": urls[c], "data": hoje}
+                 for t, c in dict.fromkeys(vinculos) if c in ok and (t, urls[c]) not in ja_vinculados]
+    vinculados = 0
+    with gravando("evidencias", exec_id):
+        for lote in _lotes(registros):
+            try:
+                cliente().table("evidencias").insert(lote).execute()
+                vinculados += len(lote)
+            except Exception as e:
+                log.warning("Falha ao gravar vínculos de evidência do ciclo %s: %s", exec_id, e)
+                nomes = dict.fromkeys(objetos[c][2] for c in objetos if urls[c] in {r["caminho"] for r in lote})
+                falhas += [(nome, f"enviado, mas o vínculo não foi gravado: {e}") for nome in nomes]
+    return vinculados, len(enviados), len(ok) - len(enviados), falhas
+
+# --- RELATÓRIO ---
+def montar_snapshot(exec_id, ciclo_nome):
+    """Dados completos do ciclo para o motor de relatório (qa_relatorio.gerar_pdf_snapshot)."""
+    return {"exec_id": exec_id, "ciclo_nome": ciclo_nome,
+            "df_testes": carregar_tabela("casos_teste", exec_id, COLS_TESTES),
+            "df_crits": carregar_tabela("criterios", exec_id, COLS_CRITERIOS),
+            "evs_data": listar_evidencias(exec_id), "agregado": resumo_testes(exec_id)}
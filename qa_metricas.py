@@ -0,0 +1,91 @@
+import os
+import json
+import time
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import pandas as pd
+
+# Instrumentação do QA Governance: chamadas ao Supabase, downloads de evidência, exportação de gráficos e fases do PDF.
+# Cada evento vira uma linha JSON no logger "qa_governance.metricas" e entra nas medições da execução corrente
+# (um rerun da interface, um job de relatório ou um ciclo do CLI), quando houver uma ativa.
+
+log = logging.getLogger("qa_governance.metricas")
+
+# Ex.: QA_METRICAS_LOG=INFO (ou DEBUG, que inclui acertos de cache). Vale também nos processos de relatório,
+# que herdam o ambiente mas não a configuração de logging do processo principal.
+METRICAS_LOG = os.environ.get("QA_METRICAS_LOG", "").upper()
+if METRICAS_LOG and not log.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    log.addHandler(_handler)
+    log.setLevel(METRICAS_LOG)
+    log.propagate = False
+
+COLUNAS = ["tipo", "alvo", "detalhe", "linhas", "bytes", "ms", "erro"]
+
+_atual = ContextVar("qa_medicoes", default=None)
+
+class Medicoes:
+    """Eventos medidos durante uma execução. `append` em lista é seguro entre threads."""
+    def __init__(self, rotulo):
+        self.rotulo = rotulo
+        self.eventos = []
+        self.inicio = time.perf_counter()
+
+    def duracao_ms(self):
+        return (time.perf_counter() - self.inicio) * 1000
+
+    def tabela(self):
+        return pd.DataFrame(self.eventos, columns=COLUNAS)
+
+    def totais(self):
+        """Eventos somados por (tipo, alvo), do mais lento para o mais rápido."""
+        df = self.tabela()
+        if df.empty: return pd.DataFrame(columns=["tipo", "alvo", "qtd", "ms", "linhas", "bytes"])
+        return (df.groupby(["tipo", "alvo"], dropna=False)
+                  .agg(qtd=("ms", "size"), ms=("ms", "sum"), linhas=("linhas", "sum"), bytes=("bytes", "sum"))
+                  .reset_index().sort_values("ms", ascending=False, ignore_index=True))
+
+def iniciar(rotulo):
+    """Abre um novo conjunto de medições para o contexto atual (thread do rerun, processo do job)."""
+    medicoes = Medicoes(rotulo)
+    _atual.set(medicoes)
+    return medicoes
+
+def atual():
+    return _atual.get()
+
+def registrar(tipo, alvo, ms, detalhe=None, linhas=None, bytes=None, erro=None, medicoes=None, nivel=logging.INFO):
+    """Registra um evento. Threads de pool não herdam o contexto: passam `medicoes` explicitamente."""
+    evento = {"tipo": tipo, "alvo": alvo, "detalhe": detalhe, "linhas": linhas, "bytes": bytes,
+              "ms": round(ms, 2), "erro": erro}
+    medicoes = medicoes or _atual.get()
+    if medicoes is not None: medicoes.eventos.append(evento)
+    if log.isEnabledFor(nivel):
+        log.log(nivel, json.dumps({"execucao": medicoes.rotulo if medicoes else None,
+                                   **{k: v for k, v in evento.items() if v is not None}}, ensure_ascii=False, default=str))
+
+@contextmanager
+def medir(tipo, alvo, **dados):
+    """Mede o bloco; o dict devolvido aceita linhas/bytes/detalhe descobertos durante a execução."""
+    t0 = time.perf_counter()
+    try:
+        yield dados
+    except Exception as e:
+        dados["erro"] = str(e)
+        raise
+    finally:
+        registrar(tipo, alvo, (time.perf_counter() - t0) * 1000, **dados)
+
+class Etapas:
+    """Cronometra fases sequenciais: cada fim(nome) registra o tempo desde a fase anterior."""
+    def __init__(self, tipo):
+        self.tipo = tipo
+        self.t0 = time.perf_counter()
+
+    def fim(self, nome, **dados):
+        agora = time.perf_counter()
+        registrar(self.tipo, nome, (agora - self.t0) * 1000, **dados)
+        self.t0 = agora
@@ -0,0 +1,506 @@
+import os
+import io
+import time
+import hashlib
+import logging
+import threading
+import multiprocessing as mp
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import pandas as pd
+import plotly.express as px
+from fpdf import FPDF
+from fpdf.enums import XPos, YPos
+
+import qa_metricas
+from qa_dados import sessao_http
+
+# Motor de relatório do QA Governance: não depende do Streamlit, para rodar em processos de fundo.
+
+log = logging.getLogger("qa_governance")
+
+EVIDENCIAS_WORKERS = int(os.environ.get("QA_EVIDENCIAS_WORKERS", "8"))
+RELATORIO_WORKERS = int(os.environ.get("QA_RELATORIO_WORKERS", "2"))
+RELATORIO_MAX_PENDENTES = int(os.environ.get("QA_RELATORIO_MAX_PENDENTES", "8"))
+RELATORIO_RETENCAO = int(os.environ.get("QA_RELATORIO_RETENCAO", "600"))  # segundos que um PDF pronto fica disponível
+GRAFICOS_PDF = os.environ.get("QA_GRAFICOS_PDF", "vetorial")  # "vetorial" (FPDF) ou "kaleido" (PNG)
+# Validade das imagens num cache de evidências em disco persistente: a URL antiga ({exec_id}/{test}_{nome})
+# é regravada com upsert, então o mesmo endereço pode passar a servir outra imagem
+EVIDENCIAS_CACHE_TTL = int(os.environ.get("QA_EVIDENCIAS_CACHE_TTL", "3600"))  # segundos
+
+CORES_GRAF = {
+    "OK": "#4b4c6a",        
+    "Falha": "#780096",       
+    "Pendente": "#c2c7cd",
+    "Bloqueado": "#5f365e",
+    "Em Execucao": "#848dae"
+}
+COR_PADRAO = "#9aa0a6"  # status fora da paleta (ex.: N/A)
+
+# --- EVIDÊNCIAS ---
+def _no_prazo(arq, ttl):
+    try: return time.time() - os.path.getmtime(arq) < ttl
+    except OSError: return False
+
+def _ler_cache(arq, ttl):
+    # None se ausente, vencido ou apagado por outro processo no meio do caminho: a imagem é baixada de novo
+    if not _no_prazo(arq, ttl): return None
+    try:
+        with open(arq, "rb") as f: return f.read()
+    except OSError:
+        return None
+
+def _expirar_cache(cache_dir, ttl):
+    # Apaga imagens vencidas (inclusive de URLs que não aparecem mais): o diretório não cresce sem limite
+    for nome in os.listdir(cache_dir):
+        arq = os.path.join(cache_dir, nome)
+        if not _no_prazo(arq, ttl):
+            try: os.remove(arq)
+            except OSError: pass  # outro processo já apagou ou está regravando
+
+def baixar_evidencias(urls, sessao, max_workers=EVIDENCIAS_WORKERS, timeout=(3, 10), ao_concluir=None, cache_dir=None,
+                      cache_ttl=EVIDENCIAS_CACHE_TTL):
+    """Baixa as imagens em paralelo com pool de threads limitado.
+    Retorna ({url: bytes}, {url: motivo da falha}); uma falha não atrasa as demais.
+    `ao_concluir(qtd_feitas, total)` é chamado a cada download terminado. Com `cache_dir`,
+    as imagens ficam em disco (por hash da URL) e são reaproveitadas entre processos por até
+    `cache_ttl` segundos; arquivos mais velhos são baixados de novo e os órfãos, apagados."""
+    medicoes = qa_metricas.atual()  # as threads do pool não herdam o contexto
+
+    def baixar(url):
+        t0 = time.perf_counter()
+        arq = os.path.join(cache_dir, hashlib.sha256(url.encode()).hexdigest()) if cache_dir else None
+        conteudo = _ler_cache(arq, cache_ttl) if arq else None
+        if conteudo is not None:
+            qa_metricas.registrar("evidencia", "cache em disco", (time.perf_counter() - t0) * 1000, detalhe=url,
+                                  bytes=len(conteudo), medicoes=medicoes)
+            return conteudo
+        try:
+            resp = sessao.get(url, timeout=timeout)
+            resp.raise_for_status()
+        except Exception as e:
+            qa_metricas.registrar("evidencia", "download", (time.perf_counter() - t0) * 1000, detalhe=url, erro=str(e),
+                                  medicoes=medicoes)
+            raise
+        qa_metricas.registrar("evidencia", "download", (time.perf_counter() - t0) * 1000, detalhe=url,
+                              bytes=len(resp.content), medicoes=medicoes)
+        if arq:
+            tmp = f"{arq}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f: f.write(resp.content)
+            os.replace(tmp, arq)  # gravação atômica: outro processo nunca lê arquivo pela metade
+        return resp.content
+
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        _expirar_cache(cache_dir, cache_ttl)
+
+    imagens, falhas = {}, {}
+    urls = list(dict.fromkeys(urls))
+    if not urls: return imagens, falhas
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(urls))) as pool:
+        futuros = {pool.submit(baixar, url): url for url in urls}
+        for fut in as_completed(futuros):
+            url = futuros[fut]
+            try: imagens[url] = fut.result()
+            except Exception as e: falhas[url] = str(e)
+            if ao_concluir: ao_concluir(len(imagens) + len(falhas), len(urls))
+    return imagens, falhas
+
+# --- GRÁFICOS VETORIAIS ---
+def agregar_status(df_testes):
+    """Contagens por (Funcionalidade, Status), formato usado pelos gráficos e pelo sumário."""
+    if df_testes.empty: return pd.DataFrame(columns=["Funcionalidade", "Status", "qtd"])
+    chaves = [df_testes["Funcionalidade"].fillna("Sem módulo"), df_testes["Status"].fillna("Pendente")]
+    return df_testes.groupby(chaves).size().reset_index(name="qtd")
+
+def _cor(status):
+    cor = CORES_GRAF.get(status, COR_PADRAO)
+    return tuple(int(cor[i:i + 2], 16) for i in (1, 3, 5))
+
+def _ordem_status(status):
+    # Mesma ordem da paleta; demais status no fim
+    ordem = list(CORES_GRAF)
+    return sorted(status, key=lambda s: (ordem.index(s) if s in ordem else len(ordem), str(s)))
+
+def desenhar_donut(pdf, contagens, x, y, diametro=60):
+    """Rosca de status (Series status -> qtd) com legenda à direita, desenhada com primitivas FPDF."""
+    contagens = contagens[contagens > 0].reindex(_ordem_status(contagens[contagens > 0].index))
+    total = int(contagens.sum())
+    if not total: return
+
+    pdf.set_font('helvetica', 'B', 10)
+    pdf.set_text_color(44, 62, 80)
+    pdf.set_xy(x, y)
+    pdf.cell(diametro, 6, "Status Geral")
+    y += 8
+
+    # Ângulos do FPDF com y para baixo: 0° às 3 horas e crescendo no sentido horário. Começa no topo (-90°)
+    # e avança no sentido horário, como a pizza do Plotly no dashboard
+    inicio = -90.0
+    for status, qtd in contagens.items():
+        angulo = 360.0 * qtd / total
+        pdf.set_fill_color(*_cor(status))
+        if angulo >= 359.99: pdf.ellipse(x, y, diametro, diametro, style="F")
+        else: pdf.solid_arc(x, y, diametro, inicio, inicio + angulo, style="F")
+        inicio += angulo
+
+    furo = diametro * 0.5
+    pdf.set_fill_color(255, 255, 255)
+    pdf.ellipse(x + (diametro - furo) / 2, y + (diametro - furo) / 2, furo, furo, style="F")
+    pdf.set_font('helvetica', 'B', 12)
+    pdf.set_xy(x, y + diametro / 2 - 3)
+    pdf.cell(diametro, 6, str(total), align='C')
+
+    pdf.set_font('helvetica', '', 9)
+    pdf.set_text_color(0, 0, 0)
+    ly = y + (diametro - 6 * len(contagens)) / 2
+    for status, qtd in contagens.items():
+        pdf.set_fill_color(*_cor(status))
+        pdf.rect(x + diametro + 10, ly + 1, 4, 4, style="F")
+        pdf.set_xy(x + diametro + 16, ly)
+        pdf.cell(60, 6, f"{status}: {qtd} ({qtd / total:.0%})")
+        ly += 6
+    pdf.set_xy(pdf.l_margin, y + diametro)
+
+def desenhar_barras(pdf, agregado, x, y, largura=170, altura=70):
+    """Barras empilhadas de status por Funcionalidade a partir do agregado (Funcionalidade, Status, qtd)."""
+    if agregado.empty: return
+    tabela = agregado.pivot_table(index="Funcionalidade", columns="Status", values="qtd", aggfunc="sum", fill_value=0)
+    tabela = tabela[_ordem_status(tabela.columns)]
+    # Topo do eixo arredondado para múltiplo de 4: as 5 linhas de grade caem em valores inteiros
+    maximo = -(-int(tabela.sum(axis=1).max()) // 4) * 4 or 4
+
+    pdf.set_font('helvetica', 'B', 10)
+    pdf.set_text_color(44, 62, 80)
+    pdf.set_xy(x, y)
+    pdf.cell(largura, 6, "Módulos")
+
+    # Legenda
+    pdf.set_font('helvetica', '', 8)
+    pdf.set_text_color(0, 0, 0)
+    lx, passo_legenda = x, min(30, largura / len(tabela.columns))
+    for status in tabela.columns:
+        pdf.set_fill_color(*_cor(status))
+        pdf.rect(lx, y + 8, 3, 3, style="F")
+        pdf.set_xy(lx + 4, y + 7)
+        pdf.cell(passo_legenda - 4, 5, str(status)[:max(3, int((passo_legenda - 4) / 1.6))])
+        lx += passo_legenda
+
+    # Eixo e linhas de grade
+    topo, base, eixo_x = y + 16, y + altura, x + 10
+    area = largura - 10
+    pdf.set_draw_color(220, 220, 220)
+    pdf.set_font('helvetica', '', 7)
+    for i in range(5):
+        valor = maximo * i / 4
+        gy = base - (base - topo) * i / 4
+        pdf.line(eixo_x, gy, eixo_x + area, gy)
+        pdf.set_xy(x, gy - 2)
+        pdf.cell(9, 4, f"{valor:.0f}", align='R')
+    pdf.set_draw_color(0, 0, 0)
+
+    passo = area / len(tabela)
+    barra = passo * 0.7
+    escala = (base - topo) / maximo
+    for i, (modulo, linha) in enumerate(tabela.iterrows()):
+        bx, acumulado = eixo_x + i * passo + (passo - barra) / 2, 0
+        for status, qtd in linha.items():
+            if not qtd: continue
+            pdf.set_fill_color(*_cor(status))
+            pdf.rect(bx, base - (acumulado + qtd) * escala, barra, qtd * escala, style="F")
+            acumulado += qtd
+        pdf.set_xy(eixo_x + i * passo, base + 1)
+        pdf.cell(passo, 4, str(modulo)[:max(3, int(passo / 1.6))], align='C')
+    pdf.set_xy(pdf.l_margin, base + 6)
+
+# --- PDF REPORT ENGINE ---
+class QAReport(FPDF):
+    def header(self):
+        self.set_font('helvetica', 'B', 10)
+        self.set_text_color(100, 100, 100)
+        self.cell(0, 10, 'SISTEMA DE GOVERNANCA DE QA - RELATORIO DE EXECUÇÃO', new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='L')
+        self.line(15, 18, 195, 18)
+        self.ln(5)
+
+    def section_header(self, title):
+        self.ln(5)
+        self.set_font('helvetica', 'B', 12)
+        self.set_fill_color(245, 247, 249)
+        self.set_text_color(44, 62, 80)
+        self.cell(0, 10, f" {title.upper()}", fill=True, new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='L')
+        self.ln(3)
+
+def gerar_pdf_completo(ciclo_nome, df_testes, df_crits, evs_data, img_pie, img_bar, falhas=None, sessao=None, progresso=None,
+                       agregado=None, cache_evidencias=None):
+    """Monta o PDF do ciclo a partir de um snapshot (DataFrames + linhas de `evidencias`).
+    `img_pie`/`img_bar` são caminhos ou bytes PNG (kaleido); sem eles os gráficos são
+    desenhados em vetor a partir das contagens. Se `falhas` for uma lista, recebe
+    (test_id, url, motivo) de cada evidência não incluída; `progresso(**estado)` recebe
+    páginas e evidências concluídas. `agregado` traz as contagens (Funcionalidade, Status, qtd)
+    já calculadas no banco; sem ele, são calculadas a partir de `df_testes`."""
+    progresso = progresso or (lambda **estado: None)
+    etapas = qa_metricas.Etapas("pdf")
+    pdf = QAReport()
+    pdf.set_margins(15, 15, 15)
+    pdf.set_auto_page_break(auto=True, margin=20)
+    
+    # --- PÁGINA 1: CAPA ---
+    pdf.add_page()
+    pdf.set_y(80)
+    pdf.set_font('helvetica', 'B', 28)
+    pdf.set_text_color(44, 62, 80)
+    pdf.cell(0, 20, "RELATÓRIO DE EXECUÇÃO DE QA", new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='C')
+    
+    pdf.set_font('helvetica', 'B', 16)
+    pdf.set_text_color(100, 100, 100)
+    pdf.cell(0, 10, f"PROJETO: {ciclo_nome.upper()}", new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='C')
+    
+    pdf.set_y(250)
+    pdf.set_font('helvetica', 'I', 10)
+    pdf.cell(0, 10, f"Gerado em: {datetime.now().strftime('%d/%m/%Y %H:%M')}", align='C')
+    etapas.fim("capa")
+
+    # --- PÁGINA 2: DASHBOARD & RESUMO ---
+    pdf.add_page()
+    pdf.section_header("SUMÁRIO EXECUTIVO")
+    
+    # Tabela de Resumo de Status
+    if agregado is None: agregado = agregar_status(df_testes)
+    status_counts = agregado.groupby("Status")["qtd"].sum().sort_values(ascending=False)
+    pdf.set_font('helvetica', 'B', 10)
+    pdf.set_fill_color(230, 230, 230)
+    pdf.cell(90, 8, "Status", border=1, fill=True)
+    pdf.cell(90, 8, "Quantidade", border=1, fill=True, new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+    
+    pdf.set_font('helvetica', '', 10)
+    for status, count in status_counts.items():
+        pdf.cell(90, 8, f" {status}", border=1)
+        pdf.cell(90, 8, f" {count}", border=1, new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+
+    # Gráficos
+    if img_pie and img_bar:
+        pdf.ln(10)
+        pdf.image(io.BytesIO(img_pie) if isinstance(img_pie, bytes) else img_pie, x=55, w=100)
+        pdf.ln(5)
+        pdf.image(io.BytesIO(img_bar) if isinstance(img_bar, bytes) else img_bar, x=20, w=170)
+    elif not agregado.empty:
+        pdf.ln(10)
+        if pdf.get_y() + 70 > pdf.page_break_trigger: pdf.add_page()
+        desenhar_donut(pdf, agregado.groupby("Status")["qtd"].sum(), x=35, y=pdf.get_y())
+        pdf.ln(8)
+        if pdf.get_y() + 80 > pdf.page_break_trigger: pdf.add_page()
+        desenhar_barras(pdf, agregado, x=20, y=pdf.get_y())
+    etapas.fim("resumo", linhas=int(agregado["qtd"].sum()))
+
+    # --- PÁGINA 3: CRITÉRIOS DE ACEITE ---
+    if not df_crits.empty:
+        pdf.add_page()
+        pdf.section_header("CRITÉRIOS DE ACEITE")
+        pdf.set_font('helvetica', 'B', 9)
+        pdf.set_fill_color(200, 205, 210)
+        pdf.cell(25, 8, "ID", border=1, fill=True)
+        pdf.cell(100, 8, "Descrição", border=1, fill=True)
+        pdf.cell(30, 8, "Prioridade", border=1, fill=True)
+        pdf.cell(25, 8, "Status", border=1, fill=True, new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+        
+        pdf.set_font('helvetica', '', 8)
+        for _, c in df_crits.iterrows():
+            pdf.cell(25, 7, f" {c['ID']}", border=1)
+            pdf.cell(100, 7, f" {str(c['Descricao'])[:60]}...", border=1)
+            pdf.cell(30, 7, f" {c['Prioridade']}", border=1)
+            pdf.cell(25, 7, f" {c['Status']}", border=1, new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+    etapas.fim("criterios", linhas=len(df_crits))
+
+    # --- DETALHAMENTO DOS TESTES ---
+    pdf.add_page()
+    pdf.section_header("DETALHAMENTO DA EXECUÇÃO")
+
+    largura_util = pdf.w - pdf.l_margin - pdf.r_margin
+    
+    # Evidências indexadas por teste uma única vez e baixadas em paralelo, em memória
+    evs_por_teste = defaultdict(list)
+    ids_testes = set(df_testes['ID'])
+    for e in evs_data:
+        if e['test_id'] in ids_testes: evs_por_teste[e['test_id']].append(e['caminho'])
+    imagens, falhas_download = baixar_evidencias(
+        [u for urls in evs_por_teste.values() for u in urls], sessao or sessao_http(),
+        ao_concluir=lambda feitas, total: progresso(fase="evidencias", evidencias=feitas, total_evidencias=total),
+        cache_dir=cache_evidencias)
+    etapas.fim("evidencias", linhas=len(imagens) + len(falhas_download), bytes=sum(map(len, imagens.values())))
+    # Usos restantes de cada imagem (a mesma evidência pode estar vinculada a vários testes):
+    # os bytes saem de `imagens` logo após o último uso, em vez de ficarem retidos até o fim do PDF
+    usos_restantes = Counter(u for urls in evs_por_teste.values() for u in urls)
+    progresso(fase="paginas", paginas=pdf.page_no())
+    
+    for _, r in df_testes.iterrows():
+        # Verificação de quebra de página preventiva (se restar menos de 60mm)
+        if pdf.get_y() > 230: 
+            pdf.add_page()
+            progresso(paginas=pdf.page_no())
+            
+        # 1. Cabeçalho do Bloco de Teste
+        pdf.set_font('helvetica', 'B', 11)
+        pdf.set_fill_color(44, 62, 80)
+        pdf.set_text_color(255, 255, 255)
+        pdf.cell(largura_util, 10, f" {r['ID']} | {r['Titulo']}", fill=True, new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+        
+        # 2. Linha de Status e Módulo (Com Cores)
+        pdf.set_text_color(0, 0, 0)
+        pdf.set_font('helvetica', 'B', 9)
+        pdf.cell( largura_util * 0.5, 8, f" MÓDULO: {r['Funcionalidade']}", border='B')
+        
+        # Define a cor do texto do Status
+        status_color = (75, 76, 106) # Cor padrão (Pendente)
+        if r['Status'] == "OK": status_color = (30, 130, 76) # Verde
+        elif r['Status'] == "Falha": status_color = (120, 0, 150) # Roxo
+        
+        pdf.set_text_color(*status_color)
+        pdf.cell(largura_util * 0.5, 8, f" STATUS: {r['Status']}", border='B', new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+        
+        # 3. Passos (Reseta cursor para a margem esquerda)
+        pdf.set_text_color(0, 0, 0)
+        pdf.ln(2)
+        pdf.set_font('helvetica', 'B', 9)
+        pdf.set_x(pdf.l_margin)
+        pdf.cell(largura_util, 7, "Passos:", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+        
+        pdf.set_font('helvetica', '', 9)
+        texto_passos = str(r['Passos']) if r['Passos'] and str(r['Passos']) != 'None' else "N/A"
+        pdf.multi_cell(largura_util, 5, texto_passos, new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+        
+        # 4. Resultado Esperado
+        pdf.ln(1)
+        pdf.set_font('helvetica', 'B', 9)
+        pdf.set_x(pdf.l_margin)
+        pdf.cell(largura_util, 7, "Resultado Esperado:", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+        
+        pdf.set_font('helvetica', '', 9)
+        texto_esperado = str(r['Esperado']) if r['Esperado'] and str(r['Esperado']) != 'None' else "N/A"
+        pdf.multi_cell(largura_util, 5, texto_esperado, new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+
+        # 5. Observações (Se existirem)
+        if r['Observacao'] and str(r['Observacao']) != 'None':
+            pdf.ln(2)
+            pdf.set_font('helvetica', 'I', 9)
+            pdf.set_text_color(150, 0, 0) # Texto em tom avermelhado para avisos
+            pdf.set_x(pdf.l_margin)
+            pdf.multi_cell(largura_util, 5, f"Obs: {r['Observacao']}", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+            pdf.set_text_color(0, 0, 0)
+
+        # 6. Evidências (Imagens do Supabase Storage)
+        current_evs = evs_por_teste.get(r['ID'], [])
+        if current_evs:
+            pdf.ln(3)
+            for url in current_evs:
+                try:
+                    if url not in imagens: raise ValueError(falhas_download.get(url, "download falhou"))
+                    # Centralização lógica da imagem (Página tem 210mm, margens 15mm cada)
+                    # Imagem com 140mm de largura
+                    pdf.image(io.BytesIO(imagens[url]), x=35, w=140)
+                    pdf.ln(2)
+                except Exception as e:
+                    log.warning("Evidência %s do teste %s não incluída no PDF: %s", url, r['ID'], e)
+                    if falhas is not None: falhas.append((r['ID'], url, str(e)))
+                    pdf.set_font('helvetica', 'I', 8)
+                    pdf.cell(largura_util, 5, " [Evidência anexada, mas não pôde ser carregada no PDF] ", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+                finally:
+                    usos_restantes[url] -= 1
+                    if not usos_restantes[url]: imagens.pop(url, None)
+        
+        pdf.ln(10) # Espaçamento final entre blocos de teste
+
+    etapas.fim("detalhe", linhas=len(df_testes))
+    saida = bytes(pdf.output())
+    etapas.fim("saida", detalhe=f"{pdf.page_no()} página(s)", bytes=len(saida))
+    progresso(fase="concluido", paginas=pdf.page_no())
+    return saida
+
+def exportar_graficos(df_testes):
+    """Gera os PNGs (pizza de status e barras por módulo) via kaleido. Retorna (pie, bar) em bytes."""
+    if df_testes.empty: return None, None
+    fig_pie = px.pie(df_testes, names='Status', title="Status Geral", color='Status', color_discrete_map=CORES_GRAF, hole=0.5)
+    fig_bar = px.bar(df_testes, x='Funcionalidade', color='Status', title="Módulos", color_discrete_map=CORES_GRAF)
+    for f in [fig_pie, fig_bar]: f.update_layout(paper_bgcolor='white', plot_bgcolor='white')
+    return fig_pie.to_image(format="png", engine="kaleido", scale=2), fig_bar.to_image(format="png", engine="kaleido", scale=2)
+
+# --- FILA DE RELATÓRIOS (processos de fundo) ---
+def versao_dados(snapshot):
+    """Hash do conteúdo do snapshot: pedidos com os mesmos dados geram o mesmo PDF."""
+    h = hashlib.sha1(str(snapshot["ciclo_nome"]).encode())
+    for df in (snapshot["df_testes"], snapshot["df_crits"]):
+        h.update(",".join(map(str, df.columns)).encode())
+        h.update(pd.util.hash_pandas_object(df.astype(str), index=False).values.tobytes())
+    for e in sorted((str(e["test_id"]), str(e["caminho"])) for e in snapshot["evs_data"]):
+        h.update("|".join(e).encode())
+    return h.hexdigest()[:16]
+
+def gerar_pdf_snapshot(snapshot, progresso=None, cache_evidencias=None):
+    """Gera o PDF de um snapshot (qa_dados.montar_snapshot). Retorna (bytes, falhas de evidência)."""
+    progresso = progresso or (lambda **estado: None)
+    img_pie, img_bar = None, None
+    if snapshot.get("graficos", GRAFICOS_PDF) == "kaleido":
+        progresso(fase="graficos")
+        with qa_metricas.medir("grafico", "kaleido", linhas=len(snapshot["df_testes"])) as med:
+            img_pie, img_bar = exportar_graficos(snapshot["df_testes"])
+            med["bytes"] = len(img_pie or b"") + len(img_bar or b"")
+    falhas = []
+    pdf = gerar_pdf_completo(snapshot["ciclo_nome"], snapshot["df_testes"], snapshot["df_crits"], snapshot["evs_data"],
+                             img_pie, img_bar, falhas=falhas, progresso=progresso, agregado=snapshot.get("agregado"),
+                             cache_evidencias=cache_evidencias)
+    return pdf, falhas
+
+def _executar_job(chave, snapshot, progresso):
+    # Roda no processo worker da fila da interface; devolve também os totais medidos no job
+    def atualizar(**estado):
+        progresso[chave] = {**progresso.get(chave, {}), **estado}
+    medicoes = qa_metricas.iniciar(f"relatorio {chave}")
+    pdf, falhas = gerar_pdf_snapshot(snapshot, progresso=atualizar)
+    return pdf, falhas, medicoes.totais()
+
+class FilaCheia(Exception):
+    pass
+
+class FilaRelatorios:
+    """Gera relatórios em um pool de processos, com limite de concorrência (workers + fila)
+    e deduplicação de pedidos iguais por (exec_id, versão dos dados)."""
+    def __init__(self, max_workers=RELATORIO_WORKERS, max_pendentes=RELATORIO_MAX_PENDENTES):
+        ctx = mp.get_context("spawn")
+        self.max_pendentes = max_pendentes
+        self._pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=ctx)
+        self._manager = ctx.Manager()
+        self._progresso = self._manager.dict()
+        self._jobs = {}  # chave -> (future, instante de submissão)
+        self._lock = threading.Lock()
+
+    def submeter(self, snapshot):
+        """Enfileira o relatório e retorna a chave do job; pedido idêntico reaproveita o job existente."""
+        chave = f"{snapshot['exec_id']}:{versao_dados(snapshot)}"
+        with self._lock:
+            self._limpar()
+            job = self._jobs.get(chave)
+            if job and not (job[0].done() and job[0].exception()):
+                return chave
+            if sum(1 for f, _ in self._jobs.values() if not f.done()) >= self.max_pendentes:
+                raise FilaCheia(f"Limite de {self.max_pendentes} relatórios em andamento atingido.")
+            self._progresso[chave] = {"fase": "na fila", "paginas": 0, "evidencias": 0, "total_evidencias": 0}
+            self._jobs[chave] = (self._pool.submit(_executar_job, chave, snapshot, self._progresso), time.monotonic())
+        return chave
+
+    def status(self, chave):
+        """Retorna (estado, progresso, resultado) com estado em executando/erro/concluido/desconhecido."""
+        job = self._jobs.get(chave)
+        if job is None: return "desconhecido", {}, None
+        fut = job[0]
+        prog = dict(self._progresso.get(chave, {}))
+        if not fut.done(): return "executando", prog, None
+        if fut.exception(): return "erro", prog, fut.exception()
+        return "concluido", prog, fut.result()
+
+    def _limpar(self):
+        # Descarta jobs terminados há mais de RELATORIO_RETENCAO segundos
+        agora = time.monotonic()
+        for chave in [k for k, (f, t0) in self._jobs.items() if f.done() and agora - t0 > RELATORIO_RETENCAO]:
+            del self._jobs[chave]
+            self._progresso.pop(chave, None)
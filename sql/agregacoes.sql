@@ -0,0 +1,38 @@
+-- Agregações do Dashboard e do Sumário Executivo: devolvem só contagens por ciclo,
+-- sem trafegar passos/esperado/observacao nem as linhas completas de bugs.
+-- Chamadas via supabase.rpc("resumo_casos_teste" | "resumo_criterios" | "resumo_bugs", {"p_exec_id": ...}).
+
+create or replace function resumo_casos_teste(p_exec_id bigint)
+returns table (funcionalidade text, status text, qtd bigint)
+language sql stable
+as $$
+    select coalesce(funcionalidade, 'Sem módulo'), coalesce(status, 'Pendente'), count(*)
+    from casos_teste
+    where exec_id = p_exec_id
+    group by 1, 2;
+$$;
+
+create or replace function resumo_criterios(p_exec_id bigint)
+returns table (funcionalidade text, status text, qtd bigint)
+language sql stable
+as $$
+    select coalesce(funcionalidade, 'Sem módulo'), coalesce(status, 'Pendente'), count(*)
+    from criterios
+    where exec_id = p_exec_id
+    group by 1, 2;
+$$;
+
+create or replace function resumo_bugs(p_exec_id bigint)
+returns table (prioridade text, status text, status_integracao text, qtd bigint)
+language sql stable
+as $$
+    select coalesce(prioridade, 'Sem prioridade'), coalesce(status, 'Novo'),
+           coalesce(status_integracao, 'Nao Integrado'), count(*)
+    from bugs
+    where exec_id = p_exec_id
+    group by 1, 2, 3;
+$$;
+
+create index if not exists casos_teste_resumo_idx on casos_teste (exec_id, funcionalidade, status);
+create index if not exists criterios_resumo_idx on criterios (exec_id, funcionalidade, status);
+create index if not exists bugs_resumo_idx on bugs (exec_id, prioridade, status, status_integracao);
@@ -0,0 +1,36 @@
+-- Numeração CA-/CT- por ciclo: reserva de blocos contíguos de IDs em uma única operação atômica.
+-- Chamada via supabase.rpc("reservar_ids", {"p_exec_id": ..., "p_prefixo": "CA" | "CT", "p_qtd": n, "p_minimo": m}).
+-- p_minimo eleva o contador quando IDs explícitos (ex.: importação de planilha) já passaram dele.
+
+create table if not exists contadores_id (
+    exec_id bigint not null,
+    prefixo text not null,
+    ultimo integer not null,
+    primary key (exec_id, prefixo)
+);
+
+create or replace function reservar_ids(p_exec_id bigint, p_prefixo text, p_qtd integer, p_minimo integer default 0)
+returns integer  -- primeiro número do bloco reservado
+language plpgsql
+as $$
+declare
+    v_ultimo integer;
+begin
+    -- Na primeira reserva do ciclo, o contador parte do maior número já usado
+    insert into contadores_id (exec_id, prefixo, ultimo)
+    select p_exec_id, p_prefixo, coalesce(max(substring(ids.id_txt from '^' || p_prefixo || '-(\d+)$')::integer), 0)
+    from (
+        select crit_id as id_txt from criterios where exec_id = p_exec_id and p_prefixo = 'CA'
+        union all
+        select test_id from casos_teste where exec_id = p_exec_id and p_prefixo = 'CT'
+    ) ids
+    on conflict (exec_id, prefixo) do nothing;
+
+    -- O lock da linha serializa reservas concorrentes: cada chamada recebe um bloco exclusivo
+    update contadores_id set ultimo = greatest(ultimo, p_minimo) + p_qtd
+    where exec_id = p_exec_id and prefixo = p_prefixo
+    returning ultimo into v_ultimo;
+
+    return v_ultimo - p_qtd + 1;
+end;
+$$;
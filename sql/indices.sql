@@ -0,0 +1,15 @@
+-- Chaves usadas pelos upserts em lote de "Salvar Critérios" e "Salvar Execução"
+-- (on_conflict = "exec_id,crit_id" / "exec_id,test_id"). Pré-requisito do salvamento por diff:
+-- aplicar antes de publicar a versão que grava por upsert. Pode ser reexecutado.
+
+-- O salvamento antigo (apaga e reinsere) podia deixar IDs repetidos no ciclo: fica a linha mais recente
+delete from criterios a using criterios b
+where a.exec_id = b.exec_id and a.crit_id = b.crit_id and a.id < b.id;
+delete from casos_teste a using casos_teste b
+where a.exec_id = b.exec_id and a.test_id = b.test_id and a.id < b.id;
+
+create unique index if not exists criterios_exec_crit_key on criterios (exec_id, crit_id);
+create unique index if not exists casos_teste_exec_test_key on casos_teste (exec_id, test_id);
+create index if not exists evidencias_exec_idx on evidencias (exec_id, test_id);
+-- Deduplicação de evidências: anexar_evidencias procura os objetos já vinculados pela URL (caminho)
+create index if not exists evidencias_caminho_idx on evidencias (caminho);
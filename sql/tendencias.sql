@@ -0,0 +1,57 @@
+-- Tendências entre ciclos: uma linha compacta de contagens por ciclo, recalculada a cada gravação
+-- do ciclo via supabase.rpc("atualizar_resumo_ciclo", {"p_exec_id": ...}). A tela de Tendências lê só
+-- esta tabela (algumas centenas de linhas), nunca casos_teste/bugs de todos os ciclos.
+
+create table if not exists resumo_ciclos (
+    exec_id bigint primary key references execucoes (id) on delete cascade,
+    testes_total integer not null default 0,
+    testes_ok integer not null default 0,
+    testes_falha integer not null default 0,
+    testes_bloqueado integer not null default 0,
+    testes_pendente integer not null default 0,  -- Pendente + Em Execucao (status nulo conta como Pendente)
+    testes_na integer not null default 0,
+    criterios_total integer not null default 0,
+    criterios_ok integer not null default 0,
+    bugs_total integer not null default 0,
+    bugs_abertos integer not null default 0,     -- Novo + Em Correção (status nulo conta como Novo)
+    bugs_criticos integer not null default 0,    -- abertos com prioridade Critica
+    atualizado_em timestamptz not null default now()
+);
+
+-- Recalcula só o ciclo informado; as contagens usam os índices (exec_id, ..., status) de sql/agregacoes.sql
+create or replace function atualizar_resumo_ciclo(p_exec_id bigint)
+returns void
+language sql
+as $$
+    insert into resumo_ciclos (exec_id, testes_total, testes_ok, testes_falha, testes_bloqueado, testes_pendente,
+                               testes_na, criterios_total, criterios_ok, bugs_total, bugs_abertos, bugs_criticos,
+                               atualizado_em)
+    select p_exec_id, t.total, t.ok, t.falha, t.bloqueado, t.pendente, t.na, c.total, c.ok, b.total, b.abertos, b.criticos, now()
+    from (
+        select count(*) as total,
+               count(*) filter (where status = 'OK') as ok,
+               count(*) filter (where status = 'Falha') as falha,
+               count(*) filter (where status = 'Bloqueado') as bloqueado,
+               count(*) filter (where coalesce(status, 'Pendente') in ('Pendente', 'Em Execucao')) as pendente,
+               count(*) filter (where status = 'N/A') as na
+        from casos_teste where exec_id = p_exec_id
+    ) t, (
+        select count(*) as total, count(*) filter (where status = 'OK') as ok
+        from criterios where exec_id = p_exec_id
+    ) c, (
+        select count(*) as total,
+               count(*) filter (where coalesce(status, 'Novo') in ('Novo', 'Em Correção')) as abertos,
+               count(*) filter (where coalesce(status, 'Novo') in ('Novo', 'Em Correção') and prioridade = 'Critica') as criticos
+        from bugs where exec_id = p_exec_id
+    ) b
+    on conflict (exec_id) do update set
+        testes_total = excluded.testes_total, testes_ok = excluded.testes_ok, testes_falha = excluded.testes_falha,
+        testes_bloqueado = excluded.testes_bloqueado, testes_pendente = excluded.testes_pendente,
+        testes_na = excluded.testes_na, criterios_total = excluded.criterios_total,
+        criterios_ok = excluded.criterios_ok, bugs_total = excluded.bugs_total,
+        bugs_abertos = excluded.bugs_abertos, bugs_criticos = excluded.bugs_criticos,
+        atualizado_em = excluded.atualizado_em;
+$$;
+
+-- Carga inicial dos ciclos existentes
+select atualizar_resumo_ciclo(id) from execucoes;
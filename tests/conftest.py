@@ -0,0 +1,101 @@
+import os
+import sys
+import json
+import threading
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qsl
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [RAIZ, os.path.join(RAIZ, "benchmarks")]
+
+import qa_dados  # noqa: E402
+import qa_metricas  # noqa: E402
+from fake_supabase import FakeSupabase  # noqa: E402
+
+# Servidor HTTP local que imita o subconjunto de PostgREST e Storage usado pelo qa_dados, para exercitar
+# o client Supabase real (httpx.HTTPTransport + TransporteMedido) sem rede externa.
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _responder(self, status, corpo=b"", tipo="application/json", cabecalhos=None):
+        self.send_response(status)
+        self.send_header("content-type", tipo)
+        self.send_header("content-length", str(len(corpo)))
+        for k, v in (cabecalhos or {}).items(): self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def _corpo(self):
+        return self.rfile.read(int(self.headers.get("content-length") or 0))
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path.startswith("/storage/v1/object/public/"):
+            conteudo = self.server.arquivos.get(url.path.removeprefix("/storage/v1/object/public/"))
+            if conteudo is None: return self._responder(404, b'{"error":"not_found"}')
+            return self._responder(200, conteudo, "application/octet-stream")
+        tabela = url.path.split("/rest/v1/", 1)[1]
+        filtros = [(k, v.split(".", 1)) for k, v in parse_qsl(url.query) if k not in ("select", "order", "limit", "offset")]
+        linhas = [r for r in self.server.tabelas.get(tabela, [])
+                  if all(str(r.get(k)) == v for k, (op, v) in filtros if op == "eq")]
+        faixa = f"0-{len(linhas) - 1}/*" if linhas else "*/0"
+        self._responder(200, json.dumps(linhas).encode(), cabecalhos={"content-range": faixa})
+
+    def do_POST(self):
+        caminho = urlsplit(self.path).path
+        corpo = self._corpo()
+        if caminho.startswith("/storage/v1/object/"):
+            chave = caminho.removeprefix("/storage/v1/object/")
+            cabecalho = f"content-type: {self.headers['content-type']}\r\n\r\n".encode()
+            partes = {p.get_param("name", header="content-disposition"): p.get_payload(decode=True)
+                      for p in BytesParser().parsebytes(cabecalho + corpo).get_payload()}
+            self.server.arquivos[chave] = partes["file"]
+            return self._responder(200, json.dumps({"Key": chave}).encode())
+        tabela = caminho.split("/rest/v1/", 1)[1]
+        registros = json.loads(corpo)
+        registros = registros if isinstance(registros, list) else [registros]
+        self.server.tabelas.setdefault(tabela, []).extend(registros)
+        self._responder(201, json.dumps(registros).encode())
+
+@pytest.fixture
+def servidor_local():
+    """Servidor em thread numa porta livre; `.tabelas` e `.arquivos` guardam o que foi gravado."""
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    servidor.tabelas, servidor.arquivos = {}, {}
+    servidor.url = f"http://127.0.0.1:{servidor.server_address[1]}"
+    thread = threading.Thread(target=servidor.serve_forever, daemon=True)
+    thread.start()
+    yield servidor
+    servidor.shutdown()
+    servidor.server_close()
+
+@pytest.fixture
+def cache_limpo(monkeypatch):
+    monkeypatch.setattr(qa_dados, "_cache", qa_dados.CacheConsultas(qa_dados.CACHE_TTL, qa_dados.CACHE_MAX_ENTRADAS))
+
+@pytest.fixture
+def supabase_local(servidor_local, cache_limpo, monkeypatch):
+    """qa_dados conectado ao servidor local pelo client Supabase real (conectar())."""
+    monkeypatch.setattr(qa_dados, "_cliente", None)
+    monkeypatch.setattr(qa_dados, "_http", None)
+    qa_dados.conectar(servidor_local.url, "chave-de-teste")
+    yield servidor_local
+    qa_dados._http.close()
+
+@pytest.fixture
+def banco(cache_limpo, monkeypatch):
+    """qa_dados apontado para o FakeSupabase em memória dos benchmarks."""
+    banco = FakeSupabase()
+    monkeypatch.setattr(qa_dados, "_cliente", banco)
+    return banco
+
+@pytest.fixture
+def medicoes():
+    return qa_metricas.iniciar("teste")
@@ -0,0 +1,259 @@
+import io
+
+import pandas as pd
+import pytest
+import requests
+
+import qa_dados
+from qa_dados import COLS_CRITERIOS, COLS_TESTES
+
+# Camada de dados sobre o FakeSupabase (benchmarks/fake_supabase.py): verifica o estado gravado, não só o retorno
+
+def _grade(linhas, col_map=COLS_TESTES):
+    return pd.DataFrame(linhas).reindex(columns=list(col_map))
+
+def _gravados(banco, tabela, chave):
+    return {r[chave]: r for r in banco.tabelas[tabela]}
+
+# --- diff_editor ---
+def test_diff_editor_separa_novos_alterados_e_removidos():
+    orig = _grade([{"ID": "CT-001", "Titulo": "a", "Status": "OK"},
+                   {"ID": "CT-002", "Titulo": "b", "Status": None},
+                   {"ID": "CT-003", "Titulo": "c", "Status": "Falha"}])
+    ed = _grade([{"ID": "CT-001", "Titulo": "a", "Status": "OK"},
+                 {"ID": "CT-002", "Titulo": "b2", "Status": None},
+                 {"ID": "CT-004", "Titulo": "d", "Status": "Pendente"}])
+
+    alterados, removidos = qa_dados.diff_editor(orig, ed)
+
+    assert sorted(alterados["ID"]) == ["CT-002", "CT-004"]
+    assert removidos == ["CT-003"]
+
+def test_diff_editor_ignora_nan_contra_none():
+    orig = _grade([{"ID": "CT-001", "Titulo": "a", "Observacao": None}])
+    ed = _grade([{"ID": "CT-001", "Titulo": "a", "Observacao": float("nan")}])
+    alterados, removidos = qa_dados.diff_editor(orig, ed)
+    assert alterados.empty and removidos == []
+
+# --- salvar_diff ---
+def test_salvar_diff_grava_so_o_diff_e_numera_linhas_novas(banco):
+    banco.gravar("casos_teste", [{"exec_id": 1, "test_id": f"CT-00{i}", "titulo": f"t{i}", "status": "OK"} for i in (1, 2, 3)])
+    orig = qa_dados.carregar_tabela("casos_teste", 1, COLS_TESTES)
+    ed = orig[orig["ID"] != "CT-003"].copy()
+    ed.loc[ed["ID"] == "CT-002", "Titulo"] = "alterado"
+    ed = pd.concat([ed, _grade([{"Titulo": "novo"}])], ignore_index=True)
+    banco.zerar_contagem()
+
+    assert qa_dados.salvar_diff("casos_teste", 1, COLS_TESTES, "CT", orig, ed) == (2, 1)
+
+    gravados = _gravados(banco, "casos_teste", "test_id")
+    assert sorted(gravados) == ["CT-001", "CT-002", "CT-004"]
+    assert gravados["CT-002"]["titulo"] == "alterado"
+    assert gravados["CT-004"]["status"] == "Pendente"
+    assert banco.chamadas[("casos_teste", "upsert")] == 1 and banco.chamadas[("casos_teste", "delete")] == 1
+
+def test_salvar_diff_numera_acima_dos_ids_digitados(banco):
+    vazio = _grade([], COLS_CRITERIOS)
+    ed = _grade([{"ID": "CA-010", "Descricao": "digitado"}, {"Descricao": "automático"}], COLS_CRITERIOS)
+
+    qa_dados.salvar_diff("criterios", 1, COLS_CRITERIOS, "CA", vazio, ed)
+    # Só IDs digitados: o contador ainda precisa passar deles, para o próximo lote não colidir
+    orig = qa_dados.carregar_tabela("criterios", 1, COLS_CRITERIOS)
+    qa_dados.salvar_diff("criterios", 1, COLS_CRITERIOS, "CA", orig,
+                         pd.concat([orig, _grade([{"ID": "CA-020", "Descricao": "outro"}], COLS_CRITERIOS)]))
+
+    assert qa_dados.criar_em_lote("criterios", COLS_CRITERIOS, "CA", 1, 2) == ["CA-021", "CA-022"]
+    assert sorted(_gravados(banco, "criterios", "crit_id")) == ["CA-010", "CA-011", "CA-020", "CA-021", "CA-022"]
+
+def test_salvar_diff_recusa_id_digitado_de_outra_pagina(banco):
+    banco.gravar("casos_teste", [{"exec_id": 1, "test_id": f"CT-{i:03}", "passos": "p", "status": "OK"} for i in range(1, 51)])
+    pagina = qa_dados.carregar_pagina("casos_teste", 1, COLS_TESTES, ["titulo"], 1, 25)[0]
+    renomeada = pagina.copy()
+    renomeada.loc[0, "ID"] = "CT-041"
+    nova = pd.concat([pagina, _grade([{"ID": "CT-040", "Titulo": "nova"}])], ignore_index=True)
+
+    for ed in (nova, renomeada):
+        with pytest.raises(qa_dados.IdEmUso, match="CT-04"):
+            qa_dados.salvar_diff("casos_teste", 1, COLS_TESTES, "CT", pagina, ed)
+
+    gravados = _gravados(banco, "casos_teste", "test_id")
+    assert len(gravados) == 50 and banco.chamadas[("casos_teste", "upsert")] == 0
+    assert {k: gravados["CT-040"][k] for k in ("passos", "status")} == {"passos": "p", "status": "OK"}
+
+# --- carregar_pagina ---
+@pytest.mark.parametrize("funcs, status, busca, esperados", [
+    ((), ("Pendente",), "", ["CT-002", "CT-003"]),
+    (("Sem módulo",), (), "", ["CT-003", "CT-004"]),
+    (("Login", "Sem módulo"), ("Pendente", "OK"), "", ["CT-001", "CT-002", "CT-003"]),
+    (("Sem módulo",), ("Pendente",), 'com "aspas', ["CT-003"]),
+    (("Login",), ("Falha",), "", []),
+])
+def test_carregar_pagina_filtra_rotulos_de_nulo(banco, funcs, status, busca, esperados):
+    banco.gravar("casos_teste", [
+        {"exec_id": 1, "test_id": "CT-001", "funcionalidade": "Login", "status": "OK", "titulo": "a"},
+        {"exec_id": 1, "test_id": "CT-002", "funcionalidade": "Login", "status": None, "titulo": "b"},
+        {"exec_id": 1, "test_id": "CT-003", "funcionalidade": None, "status": None, "titulo": 'com "aspas"'},
+        {"exec_id": 1, "test_id": "CT-004", "funcionalidade": None, "status": "Falha", "titulo": "d"}])
+
+    df, total = qa_dados.carregar_pagina("casos_teste", 1, COLS_TESTES, ["titulo"], 1, 25, funcs, status, busca)
+
+    assert df["ID"].tolist() == esperados and total == len(esperados)
+
+# --- bugs ---
+def test_salvar_bugs_grava_so_os_alterados_e_deriva_integracao(banco):
+    banco.gravar("bugs", [{"exec_id": 1, "titulo": t, "status": "Novo", "prioridade": "Alta", "id_externo": None}
+                          for t in ("a", "b")])
+    orig = qa_dados.carregar_bugs(1)
+    ed = orig.copy()
+    ed.loc[ed["titulo"] == "b", ["status", "id_externo"]] = ["Em Correção", "JIRA-7"]
+    banco.zerar_contagem()
+
+    assert qa_dados.salvar_bugs(1, orig, ed) == 1
+
+    bugs = _gravados(banco, "bugs", "titulo")
+    assert (bugs["b"]["status"], bugs["b"]["id_externo"], bugs["b"]["status_integracao"]) == ("Em Correção", "JIRA-7", "Integrado")
+    assert bugs["a"]["status"] == "Novo" and len(banco.tabelas["bugs"]) == 2
+    assert banco.chamadas[("bugs", "upsert")] == 1
+    assert banco.tabelas["resumo_ciclos"][0]["bugs_abertos"] == 2
+
+# --- cache e gravando ---
+def test_gravacao_invalida_o_cache_mesmo_com_falha_no_lote(banco, monkeypatch):
+    banco.gravar("casos_teste", [{"exec_id": 1, "test_id": "CT-001", "status": "OK"}])
+    assert qa_dados.resumo_testes(1)["qtd"].sum() == 1
+    qa_dados.resumo_testes(1)
+    assert banco.chamadas[("rpc:resumo_casos_teste", "rpc")] == 1  # segunda leitura veio do cache
+
+    chamar = banco.chamar
+    def chamar_falhando(alvo, operacao):
+        chamar(alvo, operacao)
+        if (alvo, operacao) == ("casos_teste", "insert"):
+            banco.tabelas["casos_teste"].append({"exec_id": 1, "test_id": "CT-002", "status": "Falha"})  # lote parcial
+            raise RuntimeError("HTTP 500")
+    monkeypatch.setattr(banco, "chamar", chamar_falhando)
+    with pytest.raises(RuntimeError):
+        qa_dados.criar_em_lote("casos_teste", COLS_TESTES, "CT", 1, 1)
+
+    assert qa_dados.resumo_testes(1)["qtd"].sum() == 2
+    assert banco.chamadas[("rpc:resumo_casos_teste", "rpc")] == 2
+    assert banco.tabelas["resumo_ciclos"][0]["testes_total"] == 2
+
+# --- tendências ---
+def test_carregar_tendencias_respeita_pode_ver_todos(banco):
+    banco.gravar("execucoes", [{"id": 1, "user_id": 10, "titulo": "C1", "data": "2026-01-01"},
+                               {"id": 2, "user_id": 20, "titulo": "C2", "data": "2026-02-01"},
+                               {"id": 3, "user_id": 10, "titulo": "C3", "data": "2026-03-01"}])
+    banco.gravar("casos_teste", [{"exec_id": 1, "test_id": "CT-001", "status": "OK"},
+                                 {"exec_id": 1, "test_id": "CT-002", "status": "Falha"},
+                                 {"exec_id": 2, "test_id": "CT-001", "status": "OK"}])
+    for exec_id in (1, 2): qa_dados.atualizar_resumo_ciclo(exec_id)
+
+    proprio = qa_dados.carregar_tendencias({"id": 10, "pode_ver_todos": False})
+    todos = qa_dados.carregar_tendencias({"id": 10, "pode_ver_todos": True})
+
+    assert proprio["exec_id"].tolist() == [1, 3] and todos["exec_id"].tolist() == [1, 2, 3]
+    c1, c3 = proprio.iloc[0], proprio.iloc[1]
+    assert (c1["testes_total"], c1["testes_ok"], c1["taxa_aprovacao"]) == (2, 1, 50.0)
+    assert c3["testes_total"] == 0 and pd.isna(c3["taxa_aprovacao"])  # ciclo sem linha no resumo entra zerado
+
+# --- reservar_ids ---
+def test_reservar_ids_continua_do_maior_id_do_ciclo(banco):
+    banco.gravar("casos_teste", [{"exec_id": 1, "test_id": "CT-007"}, {"exec_id": 2, "test_id": "CT-050"}])
+    assert qa_dados.reservar_ids("CT", 1, 2) == ["CT-008", "CT-009"]
+    assert qa_dados.reservar_ids("CT", 1, 1) == ["CT-010"]
+    assert qa_dados.reservar_ids("CT", 2, 1) == ["CT-051"]
+
+def test_reservar_ids_respeita_minimo_mesmo_sem_quantidade(banco):
+    assert qa_dados.reservar_ids("CA", 1, 0, 30) == []
+    assert qa_dados.reservar_ids("CA", 1, 1, 5) == ["CA-031"]
+
+# --- importação ---
+def test_validar_bloco_mapeia_so_as_colunas_do_arquivo():
+    bloco = pd.DataFrame({"Caso de Teste": ["CT-001", "", "CT-001"], "Título": ["a", "b", "c"],
+                          "Status": ["OK", "", "Quebrado"], "Coluna extra": ["x", "y", "z"]}, index=[2, 3, 4])
+
+    validas, erros = qa_dados._validar_bloco(bloco, "casos_teste")
+
+    assert list(validas.columns) == ["test_id", "titulo", "status"]
+    assert validas.loc[3].to_dict() == {"test_id": None, "titulo": "b", "status": "Pendente"}
+    assert erros.index.tolist() == [2, 4]
+    assert erros[2].startswith("ID repetido") and erros[4].startswith("Status inválido")
+
+@pytest.mark.parametrize("colunas, motivo", [(["foo", "bar"], "Nenhuma coluna reconhecida"),
+                                             (["id", "status"], "obrigatória ausente: titulo")])
+def test_validar_bloco_recusa_arquivo_sem_colunas_obrigatorias(colunas, motivo):
+    with pytest.raises(qa_dados.ArquivoInvalido, match=motivo):
+        qa_dados._validar_bloco(pd.DataFrame(columns=colunas), "casos_teste")
+
+def test_importar_nao_apaga_colunas_ausentes_do_arquivo(banco):
+    banco.gravar("casos_teste", [{"exec_id": 1, "test_id": "CT-005", "titulo": "velho", "passos": "p1", "status": "OK"}])
+    arquivo = io.BytesIO("id;titulo\nCT-005;novo\n;outro\n".encode())
+
+    gravadas, _, total_erros = qa_dados.importar_arquivo(arquivo, "casos.csv", "casos_teste", 1)
+
+    gravados = _gravados(banco, "casos_teste", "test_id")
+    assert (gravadas, total_erros) == (2, 0)
+    assert gravados["CT-005"] == {**gravados["CT-005"], "titulo": "novo", "passos": "p1", "status": "OK"}
+    assert gravados["CT-006"]["titulo"] == "outro"
+
+def test_reimportar_bugs_atualiza_pelo_id_externo(banco):
+    banco.gravar("bugs", [{"exec_id": 1, "titulo": "antigo", "id_externo": "JIRA-1", "status": "Em Correção"}])
+    planilha = "titulo;id externo\nLogin quebra;JIRA-1\nBusca lenta;JIRA-2\nSem ticket;\n".encode()
+
+    for _ in range(2):
+        assert qa_dados.importar_arquivo(io.BytesIO(planilha), "bugs.csv", "bugs", 1)[0] == 3
+
+    bugs = banco.tabelas["bugs"]
+    assert sorted(b["id_externo"] or "" for b in bugs) == ["", "", "JIRA-1", "JIRA-2"]  # só o sem ticket duplica
+    jira1 = next(b for b in bugs if b["id_externo"] == "JIRA-1")
+    assert (jira1["titulo"], jira1["status"], jira1["status_integracao"]) == ("Login quebra", "Em Correção", "Integrado")
+
+def test_importar_csv_vazio_e_recusado(banco):
+    with pytest.raises(qa_dados.ArquivoInvalido, match="vazio"):
+        qa_dados.importar_arquivo(io.BytesIO(b""), "vazio.csv", "casos_teste", 1)
+
+# --- evidências ---
+def test_ids_no_nome():
+    ids = ["CT-001", "CT-012", "CT-013", "CA-012"]
+    assert qa_dados.ids_no_nome("CT-012_login.png", ids) == ["CT-012"]
+    assert qa_dados.ids_no_nome("ct12 e ct_13.png", ids) == ["CT-012", "CT-013"]
+    assert qa_dados.ids_no_nome("tela.png", ids) == []
+
+def test_anexar_evidencias_deduplica_conteudo(banco):
+    arquivos = [("a.png", b"img-1", ["CT-001", "CT-002"]), ("b.png", b"img-1", ["CT-003"]),
+                ("c.txt", b"texto", ["CT-001"]), ("d.png", b"img-2", [])]
+
+    vinculos, enviados, existentes, falhas = qa_dados.anexar_evidencias(1, arquivos)
+
+    assert (vinculos, enviados, existentes) == (3, 1, 0)
+    assert sorted(nome for nome, _ in falhas) == ["c.txt", "d.png"]
+    (caminho,) = banco.arquivos
+    assert caminho.startswith("evidencias/conteudo/") and banco.arquivos[caminho] == b"img-1"
+    assert {e["test_id"] for e in banco.tabelas["evidencias"]} == {"CT-001", "CT-002", "CT-003"}
+    # Reenviar o mesmo conteúdo não sobe o arquivo de novo nem repete vínculos
+    assert qa_dados.anexar_evidencias(1, arquivos[:1])[:3] == (0, 0, 1)
+    assert banco.chamadas[("storage:evidencias", "upload")] == 1
+
+def test_anexar_evidencias_ida_e_volta_pelo_storage_real(supabase_local, medicoes):
+    vinculos, enviados, _, falhas = qa_dados.anexar_evidencias(1, [("CT-001.png", b"\x89PNG-evidencia", ["CT-001"])])
+
+    assert (vinculos, enviados, falhas) == (1, 1, [])
+    (registro,) = supabase_local.tabelas["evidencias"]
+    assert requests.get(registro["caminho"], timeout=5).content == b"\x89PNG-evidencia"
+    assert any(e["tipo"] == "storage" and e["erro"] is None for e in medicoes.eventos)
+
+def test_anexar_evidencias_consulta_urls_em_lotes_pequenos(banco):
+    arquivos = [(f"CT-{i:03}.png", f"img-{i}".encode(), [f"CT-{i:03}"]) for i in range(120)]
+    assert qa_dados.anexar_evidencias(1, arquivos)[:2] == (120, 120)
+    assert banco.chamadas[("evidencias", "select")] == -(-120 // qa_dados.EVIDENCIA_LOTE_CONSULTA)
+
+def test_anexar_evidencias_reporta_falha_ao_gravar_vinculos(banco, monkeypatch):
+    chamar = banco.chamar
+    def chamar_falhando(alvo, operacao):
+        if (alvo, operacao) == ("evidencias", "insert"): raise RuntimeError("HTTP 500")
+        chamar(alvo, operacao)
+    monkeypatch.setattr(banco, "chamar", chamar_falhando)
+
+    vinculos, enviados, _, falhas = qa_dados.anexar_evidencias(1, [("a.png", b"img-1", ["CT-001"])])
+
+    assert (vinculos, enviados) == (0, 1) and banco.tabelas["evidencias"] == []
+    assert falhas == [("a.png", "enviado, mas o vínculo não foi gravado: HTTP 500")]
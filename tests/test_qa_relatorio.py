@@ -0,0 +1,35 @@
+import os
+import time
+
+from fake_supabase import FakeSupabase, SessaoEvidencias
+
+import qa_relatorio
+
+# Motor de relatório: downloads de evidência com o Storage em memória
+
+URL = f"{FakeSupabase.URL_STORAGE}/evidencias/1/CT-001_tela.png"
+
+def test_cache_em_disco_vence_e_e_rebaixado(banco, tmp_path):
+    sessao = SessaoEvidencias(banco)
+    banco.arquivos["evidencias/1/CT-001_tela.png"] = b"v1"
+    assert qa_relatorio.baixar_evidencias([URL], sessao, cache_dir=str(tmp_path))[0] == {URL: b"v1"}
+
+    # Upload antigo com upsert: mesma URL, outra imagem. Dentro da validade vem do disco
+    banco.arquivos["evidencias/1/CT-001_tela.png"] = b"v2"
+    assert qa_relatorio.baixar_evidencias([URL], sessao, cache_dir=str(tmp_path))[0] == {URL: b"v1"}
+
+    (arq,) = tmp_path.iterdir()
+    vencido = time.time() - qa_relatorio.EVIDENCIAS_CACHE_TTL - 1
+    os.utime(arq, (vencido, vencido))
+    assert qa_relatorio.baixar_evidencias([URL], sessao, cache_dir=str(tmp_path))[0] == {URL: b"v2"}
+    assert banco.chamadas[("storage:download", "get")] == 2
+
+def test_cache_em_disco_apaga_orfaos_vencidos(banco, tmp_path):
+    orfao = tmp_path / "url-que-nao-aparece-mais"
+    orfao.write_bytes(b"velho")
+    vencido = time.time() - qa_relatorio.EVIDENCIAS_CACHE_TTL - 1
+    os.utime(orfao, (vencido, vencido))
+
+    qa_relatorio.baixar_evidencias([], SessaoEvidencias(banco), cache_dir=str(tmp_path))
+
+    assert not orfao.exists()
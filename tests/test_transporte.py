@@ -0,0 +1,43 @@
+import json
+import logging
+
+import httpx
+
+import qa_dados
+
+# TransporteMedido sobre httpx.HTTPTransport real, contra o servidor local do conftest
+
+def _eventos(medicoes, tipo):
+    return [e for e in medicoes.eventos if e["tipo"] == tipo]
+
+def test_upload_multipart_passa_pelo_transporte_medido(supabase_local, medicoes):
+    assert isinstance(qa_dados._http._transport, qa_dados.TransporteMedido)
+    assert isinstance(qa_dados._http._transport.base, httpx.HTTPTransport)
+
+    bucket = qa_dados.cliente().storage.from_("evidencias")
+    bucket.upload("conteudo/ab/abc.png", b"\x89PNG-teste", {"content-type": "image/png", "upsert": "true"})
+
+    assert supabase_local.arquivos["evidencias/conteudo/ab/abc.png"] == b"\x89PNG-teste"
+    (evento,) = _eventos(medicoes, "storage")
+    assert evento["alvo"] == "evidencias" and evento["erro"] is None
+    assert evento["bytes"] > len(b"\x89PNG-teste")  # corpo multipart enviado + resposta
+
+def test_leitura_e_escrita_json_registram_linhas(supabase_local, medicoes):
+    qa_dados.cliente().table("casos_teste").insert([{"exec_id": 1, "test_id": "CT-001"},
+                                                   {"exec_id": 1, "test_id": "CT-002"}]).execute()
+    dados = qa_dados.cliente().table("casos_teste").select("*").eq("exec_id", 1).execute().data
+
+    assert [r["test_id"] for r in dados] == ["CT-001", "CT-002"]
+    escrita, leitura = _eventos(medicoes, "supabase")
+    assert (escrita["alvo"], escrita["linhas"]) == ("casos_teste", 2)
+    assert (leitura["alvo"], leitura["linhas"]) == ("casos_teste", 2)
+    assert leitura["detalhe"] == "GET exec_id=eq.*"
+
+def test_valores_dos_filtros_nao_chegam_ao_log(supabase_local, medicoes, caplog):
+    supabase_local.tabelas["usuarios"] = [{"id": 1, "email": "ana@qa", "senha": "hunter2"}]
+    caplog.set_level(logging.INFO, logger="qa_governance.metricas")
+
+    assert qa_dados.autenticar("ana@qa", "hunter2")["id"] == 1
+    registrado = json.dumps(medicoes.eventos) + caplog.text
+    assert "hunter2" not in registrado and "ana@qa" not in registrado
+    assert "GET email=eq.*&senha=eq.*" in caplog.text